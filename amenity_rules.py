@@ -0,0 +1,132 @@
+import bisect
+import re
+
+import pandas as pd
+
+# (column, positive terms, negative terms, whole-word terms)
+# A column is True when any positive term appears and no negative term does.
+# Terms are matched against lower-cased amenity/fee text as substrings, except
+# those also listed as whole-word terms, which must stand as a word of their
+# own, optionally plural ('spa' and 'spas', but not 'space').
+AMENITY_RULES = [
+    ('HasWasherDryer', ['washer/dryer', 'in unit washer', 'front loading washer'], [], []),
+    ('HasAirConditioning', ['air conditioning', 'central ac', 'central aircon'], [], ['central ac']),
+    ('HasPool', ['pool'], [], []),
+    ('HasSpa', ['spa', 'hot tub'], [], ['spa']),
+    ('HasGym', ['fitness center', 'gym'], [], []),
+    ('HasEVCharging', ['ev charging'], [], []),
+    ('IsPetFriendly',
+     ['dogs allowed', 'cats allowed', 'dog friendly', 'cat friendly',
+      'pet-friendly', 'pets allowed', 'pet friendly'],
+     ['no pets', 'pets not allowed', 'not pet friendly', 'no animals'],
+     []),
+]
+
+
+def _term_pattern(term, whole_word):
+    return rf'\b{re.escape(term)}s?\b' if whole_word else re.escape(term)
+
+
+def _trie_pattern(terms):
+    """Regex alternation of terms factored by common prefix, e.g. 'pet(?:s|-)'."""
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def emit(node):
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 and '' not in node else '(?:' + '|'.join(branches) + ')'
+        return body + '?' if '' in node else body
+
+    return emit(trie)
+
+
+class AmenityClassifier:
+    """
+    Compiles a rule table into one regex and classifies text in a single scan.
+
+    The regex is a lookahead over a prefix trie of every term, so the scan
+    stops at each position where some term starts, overlapping ones included
+    ("pet friendly" inside "not pet friendly"), as plain `term in text`
+    checks would find them. There the terms sharing that first character are
+    matched individually, word boundaries included, to see which apply.
+    classify_many() scans a whole batch of texts as one string.
+    """
+
+    def __init__(self, rules=AMENITY_RULES):
+        self.columns = [rule[0] for rule in rules]
+        targets = {}  # (term, whole word) -> [(rule index, is positive term)]
+        for index, (_, positive, negative, whole_words) in enumerate(rules):
+            whole_words = {term.lower() for term in whole_words}
+            for terms, is_positive in ((positive, True), (negative, False)):
+                for term in terms:
+                    term = term.lower()
+                    targets.setdefault((term, term in whole_words), []).append((index, is_positive))
+
+        self.pattern = re.compile('(?=' + _trie_pattern({term for term, _ in targets}) + ')' if targets else r'(?!)')
+        self.by_first_char = {}  # first character -> [(term regex, [(rule index, is positive term)])]
+        for (term, whole_word), hits in targets.items():
+            pattern = re.compile(_term_pattern(term, whole_word))
+            self.by_first_char.setdefault(term[0], []).append((pattern, hits))
+
+    def _hits(self, text):
+        # (position, rule index, is positive term) for every term occurrence
+        for match in self.pattern.finditer(text):
+            start = match.start()
+            for term, rules in self.by_first_char[text[start]]:
+                if term.match(text, start):
+                    for index, is_positive in rules:
+                        yield start, index, is_positive
+
+    def _flags(self, positive, negative):
+        return {
+            column: positive[i] and not negative[i]
+            for i, column in enumerate(self.columns)
+        }
+
+    def classify(self, text):
+        """Return {column: bool} for one lower-cased text."""
+        positive = [False] * len(self.columns)
+        negative = [False] * len(self.columns)
+        for _, index, is_positive in self._hits(text):
+            (positive if is_positive else negative)[index] = True
+        return self._flags(positive, negative)
+
+    def classify_many(self, texts):
+        """Classify a batch of texts, in one scan, into a DataFrame with one boolean column per rule."""
+        texts = list(texts)
+        starts = []
+        offset = 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + 1
+        # NUL never occurs in a term, so no match spans two texts, and it is a word boundary
+        positive = [[False] * len(self.columns) for _ in texts]
+        negative = [[False] * len(self.columns) for _ in texts]
+        for start, index, is_positive in self._hits('\0'.join(texts)):
+            row = bisect.bisect_right(starts, start) - 1
+            (positive if is_positive else negative)[row][index] = True
+        return pd.DataFrame(
+            [self._flags(p, n) for p, n in zip(positive, negative)], columns=self.columns, dtype=bool
+        )
+
+
+AMENITY_CLASSIFIER = AmenityClassifier()
+
+
+def amenity_text(soup):
+    """Lower-cased amenity labels, unique features and pet/fee policy text of a detail page."""
+    labels = soup.select('.amenityLabel') + soup.select('.combinedAmenitiesList li span')
+    fee_section = soup.find(id='fees-policies-pets-tab')
+    unique_features = soup.select('.uniqueAmenity')
+
+    # Combine visible amenity text and pet-related tab content
+    text = ' '.join(el.get_text(separator=' ').lower().strip() for el in labels + unique_features)
+    if fee_section:
+        text += ' ' + fee_section.get_text(separator=' ').lower()
+    return text
@@ -0,0 +1,72 @@
+"""
+Compare parse CPU time of the full html.parser tree against FAST_PARSE
+(lxml + SoupStrainer) on saved pages, and check both give the same rows.
+
+    python benchmarks/bench_parse.py                 # pages from ./page_cache
+    python benchmarks/bench_parse.py --cache-dir DIR --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import scraper
+from fixtures import pages_from_cache
+from page_cache import CACHE_DIR
+
+PLACARD = {'Property': 'P', 'Address': 'A', 'Phone': 'N/A', 'PriceRange': None, 'ListingURL': 'U'}
+
+
+def parse_all(index_pages, detail_pages, fast):
+    scraper.FAST_PARSE = fast
+    index = [scraper.parse_index_page(html) for html in index_pages]
+    detail = [scraper.parse_property_page(html, PLACARD) for html in detail_pages]
+    return index, detail
+
+
+def time_mode(index_pages, detail_pages, fast, repeat):
+    best = {}
+    for _ in range(repeat):
+        scraper.FAST_PARSE = fast
+        start = time.process_time()
+        for html in index_pages:
+            scraper.parse_index_page(html)
+        middle = time.process_time()
+        for html in detail_pages:
+            scraper.parse_property_page(html, PLACARD)
+        end = time.process_time()
+        best['index'] = min(best.get('index', float('inf')), middle - start)
+        best['detail'] = min(best.get('detail', float('inf')), end - middle)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    index_pages, detail_pages = pages_from_cache(args.cache_dir)
+    if not index_pages and not detail_pages:
+        sys.exit(f"No cached pages in {args.cache_dir}; run scraper.py first.")
+    print(f"{len(index_pages)} index pages, {len(detail_pages)} detail pages, parser={scraper.HTML_PARSER}")
+
+    if parse_all(index_pages, detail_pages, False) != parse_all(index_pages, detail_pages, True):
+        print("WARNING: FAST_PARSE output differs from the html.parser output")
+
+    full = time_mode(index_pages, detail_pages, False, args.repeat)
+    fast = time_mode(index_pages, detail_pages, True, args.repeat)
+    for kind, pages in (('index', index_pages), ('detail', detail_pages)):
+        if not pages:
+            continue
+        print(
+            f"{kind:>6}: html.parser {full[kind] / len(pages) * 1000:7.2f} ms/page   "
+            f"fast {fast[kind] / len(pages) * 1000:7.2f} ms/page   "
+            f"x{full[kind] / max(fast[kind], 1e-9):.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
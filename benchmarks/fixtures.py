@@ -0,0 +1,229 @@
+"""
+Benchmark inputs: synthetic raw listing rows shaped like
+san_diego_county_rentals_*.csv, and a corpus of index/detail HTML pages.
+
+    python benchmarks/fixtures.py listings 100000 --out listings_100k.csv
+    python benchmarks/fixtures.py pages --from-cache          # save real pages from ./page_cache
+    python benchmarks/fixtures.py pages --synthetic 20        # or generate 20 index pages' worth
+"""
+import argparse
+import gzip
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+LISTINGS_PER_PAGE = 40
+UNITS_PER_PROPERTY = 8
+
+CITIES = [
+    ('San Diego', ['92101', '92103', '92104', '92108', '92109', '92115', '92122', '92126']),
+    ('Chula Vista', ['91910', '91911', '91913', '91915']),
+    ('Oceanside', ['92054', '92056', '92057']),
+    ('Escondido', ['92025', '92026', '92027']),
+    ('Carlsbad', ['92008', '92009', '92011']),
+    ('El Cajon', ['92019', '92020', '92021']),
+    ('La Mesa', ['91941', '91942']),
+    ('Santee', ['92071']),
+    ('Vista', ['92081', '92083', '92084']),
+    ('San Marcos', ['92069', '92078']),
+]
+STREETS = [
+    'Main St', '9th Ave', 'Market St', 'Park Blvd', 'Adams Ave', 'El Cajon Blvd',
+    'Mission Gorge Rd', 'Camino Ruiz', 'Coast Hwy', 'Broadway', 'Olive St', 'University Ave',
+]
+NAME_PARTS = (
+    ['Vista', 'Pacific', 'Harbor', 'Mission', 'Canyon', 'Palm', 'Sierra', 'Coronado', 'Bay', 'Mesa'],
+    ['Apartments', 'Residences', 'Lofts', 'Village', 'Gardens', 'Terrace', 'Commons', 'Place'],
+)
+AMENITY_COLUMNS = [
+    'HasWasherDryer', 'HasAirConditioning', 'HasPool', 'HasSpa',
+    'HasGym', 'HasEVCharging', 'IsPetFriendly'
+]
+AMENITY_RATES = [0.55, 0.5, 0.6, 0.35, 0.7, 0.2, 0.75]
+AMENITY_LABELS = [
+    'Washer/Dryer', 'Air Conditioning', 'Pool', 'Spa', 'Fitness Center', 'EV Charging', 'Pet Friendly'
+]
+BEDS = [0, 1, 2, 3, 4]
+BED_RATES = [0.08, 0.42, 0.37, 0.11, 0.02]
+
+
+def synthetic_listings(rows, seed=0):
+    """
+    Raw scraper rows: ~8 units per property, realistic price/size by beds,
+    about 1% missing SqFt, 0.2% missing Price and 2% repeated units so
+    cleaning and de-duplication have work to do.
+    """
+    rng = np.random.default_rng(seed)
+    n_props = max(1, rows // UNITS_PER_PROPERTY)
+
+    city_index = rng.integers(len(CITIES), size=n_props)
+    city = np.array([CITIES[i][0] for i in city_index], dtype=object)
+    zipcode = np.array([CITIES[i][1][j % len(CITIES[i][1])] for i, j in
+                        zip(city_index, rng.integers(100, size=n_props))], dtype=object)
+    street = pd.Series(rng.integers(100, 9999, size=n_props)).astype(str) + ' ' + \
+        pd.Series(np.array(STREETS, dtype=object)[rng.integers(len(STREETS), size=n_props)])
+    names = pd.Series(np.array(NAME_PARTS[0], dtype=object)[rng.integers(len(NAME_PARTS[0]), size=n_props)]) + ' ' + \
+        pd.Series(np.array(NAME_PARTS[1], dtype=object)[rng.integers(len(NAME_PARTS[1]), size=n_props)]) + \
+        ' ' + pd.Series(np.arange(n_props)).astype(str)
+    properties = pd.DataFrame({
+        'Property': names,
+        'Address': street + ', ' + city + ', CA ' + zipcode,
+        'City': city,
+        'ZipCode': zipcode.astype(int),
+        'Phone': rng.integers(6190000000, 8589999999, size=n_props),
+        'ListingURL': 'https://www.apartments.com/' + names.str.lower().str.replace(' ', '-') +
+                      '-ca/' + pd.Series(rng.integers(36 ** 6, 36 ** 7, size=n_props)).map(lambda n: np.base_repr(n, 36)).str.lower() + '/',
+        'premium': rng.normal(0, 350, size=n_props) + np.where(np.isin(city, ['Carlsbad', 'San Diego']), 300, 0),
+    })
+    for column, rate in zip(AMENITY_COLUMNS, AMENITY_RATES):
+        properties[column] = rng.random(n_props) < rate
+
+    df = properties.iloc[rng.integers(n_props, size=rows)].reset_index(drop=True)
+    beds = rng.choice(BEDS, size=rows, p=BED_RATES)
+    baths = np.maximum(1, beds - rng.integers(0, 2, size=rows)).astype(float)
+    sqft = np.round(450 + beds * 320 + rng.normal(0, 90, size=rows))
+    price = np.round(1500 + beds * 650 + df['premium'].to_numpy() + rng.normal(0, 250, size=rows))
+    sqft[rng.random(rows) < 0.01] = np.nan
+    price[rng.random(rows) < 0.002] = np.nan
+
+    df.insert(2, 'State', 'CA')
+    df.insert(6, 'Unit', 'Unit ' + pd.Series(rng.integers(100, 2400, size=rows)).astype(str))
+    df.insert(7, 'Beds', beds)
+    df.insert(8, 'Baths', baths)
+    df.insert(9, 'Beds_Baths', pd.Series(beds).astype(str) + ' Bed / ' + pd.Series(baths).map('{:g}'.format) + ' Bath')
+    df.insert(10, 'SqFt', sqft)
+    df.insert(11, 'Price', price)
+    df.insert(12, 'PricePerSqFt', np.round(price / sqft, 2))
+    df.insert(13, 'RentalType', np.where(rng.random(rows) < 0.9, 'Apartment', 'Condo'))
+    df = df.drop(columns='premium')
+    # Re-listed units: a few rows repeat others
+    take = np.arange(rows)
+    repeats = rng.random(rows) < 0.02
+    take[repeats] = rng.integers(rows, size=int(repeats.sum()))
+    df = df.iloc[take].reset_index(drop=True)
+    return df[['Property', 'Address', 'City', 'State', 'ZipCode', 'Phone', 'Unit', 'Beds', 'Baths',
+               'Beds_Baths', 'SqFt', 'Price', 'PricePerSqFt', 'RentalType'] + AMENITY_COLUMNS + ['ListingURL']]
+
+
+def _filler(rng, blocks):
+    # Navigation, scripts and reviews that the parser has to wade through on real pages
+    return ''.join(
+        f'<div class="section-{i}"><script>window.data{i}={{"id":{rng.integers(10 ** 6)},"v":"{"x" * 40}"}};</script>'
+        f'<nav><ul>' + ''.join(f'<li><a href="/link/{i}/{j}">Link {j}</a></li>' for j in range(8)) + '</ul></nav>'
+        f'<p class="review">Lovely place, quiet neighbors, close to the beach. Review {i}.</p></div>'
+        for i in range(blocks)
+    )
+
+
+def synthetic_pages(index_pages=5, seed=0):
+    """(index_pages, detail_pages) HTML in apartments.com markup: 40 placards per index page, one detail page each."""
+    rng = np.random.default_rng(seed)
+    index_html, detail_html = [], []
+    for page in range(index_pages):
+        placards = []
+        for n in range(LISTINGS_PER_PAGE):
+            url = f"https://www.apartments.com/property-{page}-{n}/abc{n}/"
+            placards.append(
+                f'<article data-url="{url}"><div class="placard-header">'
+                f'<span class="js-placardTitle title">Property {page}-{n}</span>'
+                f'<div class="property-address">{100 + n} Main St, San Diego, CA 921{n % 30:02d}</div></div>'
+                f'<div class="property-pricing">${1800 + n * 25} - ${2600 + n * 30}</div>'
+                f'<button class="phone-link" phone-data="619555{n:04d}"></button></article>'
+            )
+            has = rng.random(len(AMENITY_LABELS)) < AMENITY_RATES
+            amenities = ''.join(
+                f'<li><span class="amenityLabel">{label}</span></li>' for label, on in zip(AMENITY_LABELS, has) if on
+            )
+            units = ''.join(
+                f'<li class="unitContainer js-unitContainerV3" data-beds="{k % 4}" data-baths="{1 + k % 2}">'
+                f'<div class="unitColumn column"><span>Unit</span> {100 + k}</div>'
+                f'<div class="pricingColumn column"><span>price</span>${2000 + k * 35}</div>'
+                f'<div class="sqftColumn column"><span>square feet</span>{650 + k * 40}</div></li>'
+                for k in range(int(rng.integers(2, 24)))
+            )
+            pets = 'Dogs Allowed, Cats Allowed' if has[-1] else 'No Pets'
+            detail_html.append(
+                f'<html><head><meta property="og:title" content="Property {page}-{n} Apartment for rent">'
+                f'</head><body>{_filler(rng, 60)}<div class="pricingGridItem"><ul>{units}</ul></div>'
+                f'<ul class="combinedAmenitiesList">{amenities}</ul>'
+                f'<div id="fees-policies-pets-tab"><p>{pets}</p></div>{_filler(rng, 30)}</body></html>'
+            )
+        index_html.append(
+            f'<html><body>{_filler(rng, 20)}<div id="placardContainer"><ul>{"".join(placards)}</ul></div>'
+            f'{_filler(rng, 10)}</body></html>'
+        )
+    return index_html, detail_html
+
+
+def save_pages(index_pages, detail_pages, directory=FIXTURE_DIR):
+    for kind, pages in (('index', index_pages), ('detail', detail_pages)):
+        os.makedirs(os.path.join(directory, kind), exist_ok=True)
+        for i, html in enumerate(pages):
+            with open(os.path.join(directory, kind, f"{i:05d}.html.gz"), 'wb') as f:
+                f.write(gzip.compress(html.encode('utf-8')))
+
+
+def load_pages(directory=FIXTURE_DIR):
+    """Saved (index_pages, detail_pages), or two empty lists if no corpus was saved."""
+    pages = {}
+    for kind in ('index', 'detail'):
+        folder = os.path.join(directory, kind)
+        names = sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+        pages[kind] = []
+        for name in names:
+            with open(os.path.join(folder, name), 'rb') as f:
+                pages[kind].append(gzip.decompress(f.read()).decode('utf-8'))
+    return pages['index'], pages['detail']
+
+
+def pages_from_cache(cache_dir):
+    """
+    (index_pages, detail_pages) from a page cache, told apart by content:
+    index pages hold placards, whatever search or shard URL they came from.
+    Pages that are neither (an empty results page) are left out.
+    """
+    import scraper
+    from page_cache import PageCache
+    cache = PageCache(cache_dir, replay=True)
+    index_pages, detail_pages = [], []
+    for _, html in cache.iter_pages():
+        if scraper.parse_index_page(html)[1]:
+            index_pages.append(html)
+        elif scraper.page_complete(html, 'detail'):
+            detail_pages.append(html)
+    cache.close()
+    return index_pages, detail_pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate or save benchmark inputs.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    listings = commands.add_parser('listings', help='write synthetic raw listing rows to CSV')
+    listings.add_argument('rows', type=int)
+    listings.add_argument('--out', required=True)
+    listings.add_argument('--seed', type=int, default=0)
+    pages = commands.add_parser('pages', help=f'save an HTML corpus to {FIXTURE_DIR}')
+    source = pages.add_mutually_exclusive_group(required=True)
+    source.add_argument('--from-cache', nargs='?', const='page_cache', metavar='CACHE_DIR')
+    source.add_argument('--synthetic', type=int, metavar='INDEX_PAGES')
+    pages.add_argument('--dir', default=FIXTURE_DIR)
+    args = parser.parse_args()
+
+    if args.command == 'listings':
+        synthetic_listings(args.rows, args.seed).to_csv(args.out, index=False)
+        print(f"Wrote {args.rows} rows to {args.out}")
+    else:
+        index_pages, detail_pages = (
+            pages_from_cache(args.from_cache) if args.from_cache else synthetic_pages(args.synthetic)
+        )
+        save_pages(index_pages, detail_pages, args.dir)
+        print(f"Saved {len(index_pages)} index and {len(detail_pages)} detail pages to {args.dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+Time each pipeline stage on fixed inputs and keep the results for comparison
+across commits.
+
+    python benchmarks/run_benchmarks.py                       # 10k/100k/1M rows, HTML corpus
+    python benchmarks/run_benchmarks.py --sizes 10000 --repeat 5
+    python benchmarks/run_benchmarks.py --db-url postgresql://localhost/bench   # also time the DB load
+    python benchmarks/run_benchmarks.py --compare             # last run against the previous commit's
+
+Stages: parse_index, parse_detail, amenities (extract_amenities on parsed
+detail pages), clean (clean_and_finalize_dataframe), ids
+(generate_property_ids, cold and with a warm registry) and db_load
+(COPY + upsert, first load and re-load). HTML comes from
+benchmarks/fixtures/ when a corpus was saved there, else synthetic pages.
+Results are appended to benchmarks/results.jsonl.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+import fixtures
+import rental_core
+import scraper
+
+RESULTS_PATH = os.path.join(HERE, "results.jsonl")
+SIZES = [10_000, 100_000, 1_000_000]
+SYNTHETIC_INDEX_PAGES = 5
+BENCH_MONTH, BENCH_YEAR = 'January', '1900'  # rows the DB stage writes, and deletes afterwards
+
+
+def best_time(func, repeat):
+    """Best wall time of `repeat` runs of func(), and its last result."""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def record(results, stage, seconds, items, unit):
+    results[stage] = {'seconds': round(seconds, 6), 'items': items, 'unit': unit,
+                      'per_item_us': round(seconds / items * 1e6, 3) if items else None}
+    print(f"{stage:>22}: {seconds * 1000:10.1f} ms  {items:>9} {unit:<6} "
+          f"{results[stage]['per_item_us'] or 0:10.2f} us/{unit}")
+
+
+def bench_html(results, repeat):
+    index_pages, detail_pages = fixtures.load_pages()
+    source = 'saved corpus'
+    if not index_pages and not detail_pages:
+        index_pages, detail_pages = fixtures.synthetic_pages(SYNTHETIC_INDEX_PAGES)
+        source = 'synthetic pages'
+    print(f"HTML: {len(index_pages)} index / {len(detail_pages)} detail pages ({source}), parser={scraper.HTML_PARSER}")
+    placard = {'Property': 'P', 'Address': 'A', 'Phone': 'N/A', 'PriceRange': None, 'ListingURL': 'U'}
+
+    seconds, _ = best_time(lambda: [scraper.parse_index_page(html) for html in index_pages], repeat)
+    record(results, 'parse_index', seconds, len(index_pages), 'page')
+    seconds, _ = best_time(lambda: [scraper.parse_property_page(html, placard) for html in detail_pages], repeat)
+    record(results, 'parse_detail', seconds, len(detail_pages), 'page')
+    soups = [scraper.make_soup(html, scraper.DETAIL_STRAINER) for html in detail_pages]
+    seconds, _ = best_time(lambda: [scraper.extract_amenities(soup) for soup in soups], repeat)
+    record(results, 'amenities', seconds, len(soups), 'page')
+
+
+def bench_rows(results, rows, repeat, db_url):
+    raw = fixtures.synthetic_listings(rows)
+    tag = f"{rows // 1000}k" if rows < 1_000_000 else f"{rows // 1_000_000}M"
+
+    seconds, cleaned = best_time(lambda: rental_core.clean_and_finalize_dataframe(raw.copy(), {}), repeat)
+    record(results, f'clean_{tag}', seconds, rows, 'row')
+
+    keys = rental_core.property_keys(cleaned)
+    seconds, _ = best_time(lambda: rental_core.generate_property_ids(keys, {}), repeat)
+    record(results, f'ids_cold_{tag}', seconds, len(keys), 'row')
+    registry = {}
+    rental_core.generate_property_ids(keys, registry)
+    seconds, _ = best_time(lambda: rental_core.generate_property_ids(keys, registry), repeat)
+    record(results, f'ids_warm_{tag}', seconds, len(keys), 'row')
+
+    if db_url:
+        bench_db(results, cleaned, tag, db_url)
+
+
+def bench_db(results, cleaned, tag, db_url):
+    import csv_to_postgresql as loader
+    from sqlalchemy import create_engine
+
+    final = rental_core.finalize_for_db(cleaned, BENCH_MONTH, BENCH_YEAR)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.csv')
+        final.to_csv(path, index=False)
+        engine = create_engine(db_url)
+        conn = engine.raw_connection()
+        try:
+            loader.create_table(conn)
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM rental_data WHERE year = %s", (int(BENCH_YEAR),))
+            conn.commit()
+            for stage in ('insert', 'update'):
+                start = time.perf_counter()
+                loader.upsert_csv(conn, path)
+                record(results, f'db_load_{stage}_{tag}', time.perf_counter() - start, len(final), 'row')
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM rental_data WHERE year = %s", (int(BENCH_YEAR),))
+            conn.commit()
+        finally:
+            conn.close()
+            engine.dispose()
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=HERE,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def load_runs(path=RESULTS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(runs):
+    """Print the latest run's stages against the latest run from a different commit."""
+    if not runs:
+        print("No benchmark results yet.")
+        return
+    latest = runs[-1]
+    previous = next((run for run in reversed(runs[:-1]) if run['commit'] != latest['commit']), None)
+    if previous is None:
+        print(f"Only one commit benchmarked ({latest['commit']}).")
+        return
+    print(f"{previous['commit']} -> {latest['commit']}")
+    for stage, now in latest['stages'].items():
+        before = previous['stages'].get(stage)
+        if before is None:
+            print(f"{stage:>22}: {now['seconds'] * 1000:10.1f} ms  (new)")
+            continue
+        ratio = now['seconds'] / before['seconds'] if before['seconds'] else float('inf')
+        print(f"{stage:>22}: {before['seconds'] * 1000:10.1f} -> {now['seconds'] * 1000:10.1f} ms  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the pipeline benchmarks.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='synthetic row counts')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage; best time is kept (1 at 1M rows)')
+    parser.add_argument('--db-url', default=os.getenv('BENCH_DB_URL'),
+                        help='SQLAlchemy URL of a scratch Postgres to time the loader against')
+    parser.add_argument('--skip-html', action='store_true')
+    parser.add_argument('--compare', action='store_true', help='only compare stored results')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(load_runs())
+        return
+
+    results = {}
+    if not args.skip_html:
+        bench_html(results, args.repeat)
+    for rows in args.sizes:
+        print(f"Synthetic listings: {rows} rows")
+        bench_rows(results, rows, args.repeat if rows < 1_000_000 else 1, args.db_url)
+
+    run = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'stages': results,
+    }
+    with open(RESULTS_PATH, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+    print(f"Results appended to {RESULTS_PATH}")
+    compare(load_runs())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+"""
+Comparable-rent lookups over the latest processed snapshot: "what do 2-bed,
+1-bath, ~900 sqft units in 92104 with a washer/dryer rent for?"
+
+    python comp_service.py query --zipcode 92104 --beds 2 --baths 1 --sqft 900 --amenities washerdryer
+    python comp_service.py serve --port 8766                  # GET /comps?zipcode=92104&beds=2&sqft=900
+    python comp_service.py serve --store snapshot_store       # latest month of the snapshot store
+
+Listings are split into segments by (zipcode, beds) when the index is
+built; each segment holds numpy arrays of baths, sqft, price and a packed
+amenity bitmask, plus its rent percentiles. A query ranks one segment
+(falling back to all zip codes for that bed count when the zip has fewer
+than k listings), so it touches a few hundred rows at most.
+
+The server checks for a newer snapshot every RELOAD_SECONDS (or on POST
+/reload), builds a fresh index off to the side and swaps it in with one
+assignment, so requests never see a half-built index.
+"""
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from rent_cube import AMENITY_DIMS
+from rental_schema import apply_schema, format_property_id, text_column
+from snapshot_diff import snapshot_period
+
+SNAPSHOT_GLOB = "SD_county_*.csv"
+SERVE_PORT = 8766
+RELOAD_SECONDS = 60
+DEFAULT_K = 10
+MAX_K = 200  # largest k a query may ask for
+PERCENTILES = [10, 25, 50, 75, 90]
+SQFT_SCALE = 100.0  # 100 sqft apart costs as much as one bath apart
+BATH_WEIGHT = 1.0
+AMENITY_WEIGHT = 2.0  # per requested amenity the comp lacks
+SQFT_MISSING_PENALTY = 3.0  # comps with no sqft, when the target has one
+COMP_COLUMNS = ['property_id', 'property', 'address', 'unit', 'beds', 'baths', 'sqft', 'price', 'listingurl']
+AMENITY_BITS = {name: 1 << i for i, name in enumerate(AMENITY_DIMS)}
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def amenity_mask(names):
+    """Bitmask for amenity names given loosely: 'washerdryer', 'HasWasherDryer', 'pet_friendly', 'gym'..."""
+    mask = 0
+    for name in names:
+        key = ''.join(c for c in name.lower() if c.isalnum())
+        match = next((column for column in AMENITY_DIMS
+                      if key in (column, column[3:] if column.startswith('has') else column[2:])), None)
+        if match is None:
+            raise ValueError(f"Unknown amenity {name!r}; one of {', '.join(AMENITY_DIMS)}")
+        mask |= AMENITY_BITS[match]
+    return mask
+
+
+class Segment:
+    __slots__ = ('rows', 'baths', 'sqft', 'price', 'bits', 'percentiles')
+
+    def __init__(self, rows, listings):
+        self.rows = rows
+        self.baths = listings['baths'].to_numpy(dtype='float32', na_value=np.nan)[rows]
+        self.sqft = listings['sqft'].to_numpy(dtype='float32', na_value=np.nan)[rows]
+        self.price = listings['price'].to_numpy(dtype='float64')[rows]
+        self.bits = listings['_bits'].to_numpy()[rows]
+        self.percentiles = np.percentile(self.price, PERCENTILES).round(0).tolist()
+
+
+class CompIndex:
+    """Per-(zipcode, beds) and per-beds segments over one snapshot's priced listings."""
+
+    def __init__(self, df, label=None):
+        df = apply_schema(df)
+        df = df[df['price'].notna() & df['beds'].notna()].reset_index(drop=True)
+        bits = np.zeros(len(df), dtype=np.uint8)
+        for name, bit in AMENITY_BITS.items():
+            if name in df.columns:
+                bits |= np.where(df[name].fillna(False).to_numpy(dtype=bool), bit, 0).astype(np.uint8)
+        self.listings = df.assign(_bits=bits)
+        self.label = label
+        self.loaded_at = time.time()
+        zipcode = text_column(df['zipcode']).fillna('') if 'zipcode' in df.columns else pd.Series('', index=df.index)
+        beds = df['beds'].astype(int)
+        self.segments = {
+            key: Segment(rows, self.listings)
+            for key, rows in pd.Series(np.arange(len(df))).groupby([zipcode, beds]).indices.items()
+        }
+        self.bed_segments = {
+            int(key): Segment(rows, self.listings)
+            for key, rows in pd.Series(np.arange(len(df))).groupby(beds).indices.items()
+        }
+        # JSON-ready comp rows, so a lookup only indexes a list
+        comp_rows = df[[c for c in COMP_COLUMNS if c in df.columns]]
+        if 'property_id' in comp_rows.columns:
+            comp_rows = comp_rows.assign(property_id=format_property_id(comp_rows['property_id']))
+        self.records = json.loads(comp_rows.to_json(orient='records'))
+
+    def comps(self, zipcode, beds, baths=None, sqft=None, amenities=0, k=DEFAULT_K):
+        """
+        The k closest comps to a target unit and rent percentiles. Distance adds
+        |sqft gap| / SQFT_SCALE, BATH_WEIGHT per bath apart and AMENITY_WEIGHT
+        per requested amenity (a bitmask from amenity_mask) the comp lacks.
+        """
+        zipcode, beds = str(zipcode), int(beds)
+        segment, scope = self.segments.get((zipcode, beds)), 'zipcode'
+        if segment is None or len(segment.rows) < k:
+            segment, scope = self.bed_segments.get(beds), 'county'
+        if segment is None:
+            return {'scope': None, 'segment_size': 0, 'comps': [], 'percentiles': None, 'segment_percentiles': None}
+
+        distance = np.zeros(len(segment.rows), dtype='float32')
+        if sqft is not None:
+            gap = np.abs(segment.sqft - np.float32(sqft)) / SQFT_SCALE
+            distance += np.where(np.isnan(gap), SQFT_MISSING_PENALTY, gap)
+        if baths is not None:
+            gap = np.abs(segment.baths - np.float32(baths)) * BATH_WEIGHT
+            distance += np.where(np.isnan(gap), BATH_WEIGHT, gap)
+        if amenities:
+            distance += POPCOUNT[~segment.bits & np.uint8(amenities)] * np.float32(AMENITY_WEIGHT)
+
+        n = min(k, len(distance))
+        nearest = np.argpartition(distance, n - 1)[:n] if n < len(distance) else np.arange(n)
+        nearest = nearest[np.argsort(distance[nearest], kind='stable')]
+        comps = [
+            dict(self.records[row], distance=round(float(d), 2))
+            for row, d in zip(segment.rows[nearest], distance[nearest])
+        ]
+        return {
+            'scope': scope,
+            'segment_size': len(segment.rows),
+            'comps': comps,
+            'percentiles': dict(zip(PERCENTILES, np.percentile(segment.price[nearest], PERCENTILES).round(0).tolist())),
+            'segment_percentiles': dict(zip(PERCENTILES, segment.percentiles)),
+        }
+
+
+def latest_snapshot(pattern=SNAPSHOT_GLOB):
+    """Newest processed snapshot file by its month/year, or None."""
+    paths = glob.glob(pattern)
+    return max(paths, key=lambda path: snapshot_period(path)[0]) if paths else None
+
+
+class SnapshotSource:
+    """Where the latest snapshot comes from: processed CSVs or a snapshot store. version() changes when it does."""
+
+    def __init__(self, pattern=SNAPSHOT_GLOB, store_dir=None):
+        self.pattern = pattern
+        self.store_dir = store_dir
+
+    def version(self):
+        if self.store_dir:
+            from snapshot_store import SnapshotStore
+            store = SnapshotStore(self.store_dir)
+            partitions = store.partitions()
+            if not partitions:
+                return None
+            year, month = partitions[-1]
+            path = os.path.join(self.store_dir, f"year={year}", f"month={month}")
+            return f"{year}-{month:02d}", max(os.path.getmtime(p) for p in glob.glob(os.path.join(path, '*')))
+        path = latest_snapshot(self.pattern)
+        return (snapshot_period(path)[1], os.path.getmtime(path), path) if path else None
+
+    def load(self, version):
+        if self.store_dir:
+            from snapshot_store import SnapshotStore
+            year, month = map(int, version[0].split('-'))
+            return CompIndex(SnapshotStore(self.store_dir).read(since=(year, month), until=(year, month)), version[0])
+        return CompIndex(pd.read_csv(version[2], dtype={'property_id': str}), version[0])
+
+
+class CompService:
+    """Holds the current CompIndex and replaces it whole when the source has a newer snapshot."""
+
+    def __init__(self, source):
+        self.source = source
+        self.version = None
+        self.index = None
+        self.lock = threading.Lock()  # one reload at a time; readers never take it
+        self.reload()
+
+    def reload(self):
+        """Load the latest snapshot if it changed; True when a new index was swapped in."""
+        with self.lock:
+            version = self.source.version()
+            if version is None or version == self.version:
+                return False
+            index = self.source.load(version)
+            self.index, self.version = index, version  # readers see the old or the new index, never a mix
+            return True
+
+    def watch(self, interval=RELOAD_SECONDS):
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self.reload():
+                        print(f"Reloaded comps index: {self.index.label} ({len(self.index.listings)} listings)")
+                except Exception as e:  # keep serving the previous index
+                    print(f"Reload failed, keeping {self.index.label}: {e}")
+        threading.Thread(target=run, daemon=True).start()
+
+
+def parse_query(params):
+    """comps() keyword arguments from query-string or JSON parameters."""
+    get = lambda name: params.get(name)[0] if isinstance(params.get(name), list) else params.get(name)
+    if get('zipcode') is None or get('beds') is None:
+        raise ValueError("zipcode and beds are required")
+    amenities = get('amenities') or []
+    if isinstance(amenities, str):
+        amenities = [a for a in amenities.split(',') if a]
+    k = int(get('k')) if get('k') not in (None, '') else DEFAULT_K
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"k must be between 1 and {MAX_K}")
+    return {
+        'zipcode': str(get('zipcode')),
+        'beds': int(get('beds')),
+        'baths': float(get('baths')) if get('baths') not in (None, '') else None,
+        'sqft': float(get('sqft')) if get('sqft') not in (None, '') else None,
+        'amenities': amenity_mask(amenities),
+        'k': k,
+    }
+
+
+def make_handler(service):
+    class CompHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _comps(self, params):
+            try:
+                query = parse_query(params)
+            except (ValueError, TypeError) as e:
+                self._reply(400, {'error': str(e)})
+                return
+            index = service.index  # one reference for the whole request
+            start = time.perf_counter()
+            result = index.comps(**query)
+            result.update(snapshot=index.label, lookup_ms=round((time.perf_counter() - start) * 1000, 3))
+            self._reply(200, result)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path != '/comps':
+                self.send_error(404)
+                return
+            self._comps(parse_qs(url.query))
+
+        def do_POST(self):
+            if self.path == '/reload':
+                self._reply(200, {'reloaded': service.reload(), 'snapshot': service.index.label})
+                return
+            if self.path != '/comps':
+                self.send_error(404)
+                return
+            try:
+                params = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            except ValueError as e:
+                self._reply(400, {'error': str(e)})
+                return
+            self._comps(params)
+
+        def log_message(self, format, *args):
+            pass
+
+    return CompHandler
+
+
+class CompServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparable-rent lookups over the latest snapshot.")
+    parser.add_argument('--snapshots', default=SNAPSHOT_GLOB, help='processed snapshot files (glob)')
+    parser.add_argument('--store', help='use the latest month of this snapshot store instead')
+    commands = parser.add_subparsers(dest='command', required=True)
+    query = commands.add_parser('query', help='print comps for one target unit')
+    query.add_argument('--zipcode', required=True)
+    query.add_argument('--beds', type=int, required=True)
+    query.add_argument('--baths', type=float)
+    query.add_argument('--sqft', type=float)
+    query.add_argument('--amenities', default='', help='comma-separated, e.g. washerdryer,pool')
+    query.add_argument('--k', type=int, default=DEFAULT_K)
+    serve = commands.add_parser('serve', help='HTTP endpoint: GET or POST /comps, POST /reload')
+    serve.add_argument('--port', type=int, default=SERVE_PORT)
+    serve.add_argument('--reload-seconds', type=int, default=RELOAD_SECONDS)
+    args = parser.parse_args()
+
+    service = CompService(SnapshotSource(args.snapshots, args.store))
+    if service.index is None:
+        parser.error("no snapshot found")
+    if args.command == 'query':
+        params = {name: getattr(args, name) for name in ('zipcode', 'beds', 'baths', 'sqft', 'amenities', 'k')}
+        try:
+            query = parse_query(params)
+        except ValueError as e:
+            parser.error(str(e))
+        result = service.index.comps(**query)
+        print(f"{service.index.label}: {result['scope']} segment of {result['segment_size']} listings")
+        print(pd.DataFrame(result['comps']).to_string(index=False))
+        print(f"Comp rent percentiles: {result['percentiles']}")
+        print(f"Segment rent percentiles: {result['segment_percentiles']}")
+        return
+
+    service.watch(args.reload_seconds)
+    server = CompServer(('127.0.0.1', args.port), make_handler(service))
+    print(f"Serving comps for {service.index.label} on http://127.0.0.1:{args.port}/comps")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""Marks the repository root for pytest, which puts it on sys.path so tests import the scripts directly."""
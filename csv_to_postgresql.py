@@ -1,51 +1,223 @@
-import pandas as pd
-from sqlalchemy import create_engine
+import argparse
+import csv
+import glob
 import os
-from dotenv import load_dotenv
-from tkinter import Tk, filedialog
-
-# Load environment variables from .env file
-load_dotenv()
-
-db_user = os.getenv('DB_USER')
-db_password = os.getenv('DB_PASSWORD')
-db_host = os.getenv('DB_HOST')
-db_port = os.getenv('DB_PORT')
-db_name = os.getenv('DB_NAME')
-
-# Prompt for CSV files using file dialog
-root = Tk()
-root.withdraw()  # Hide the main window
-file_paths = filedialog.askopenfilenames(
-    title="Select one or more rental CSV files to import",
-    filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
-)
-root.destroy()
-
-if not file_paths:
-    print("No files selected. Exiting.")
-    exit()
-
-engine = create_engine(
-    f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}'
-)
-
-for csv_file in file_paths:
-    print(f'Importing {csv_file} ...')
-    df = pd.read_csv(csv_file)
-    # Ensure correct types for month/year (best practice)
-    df['month'] = df['month'].astype(int)
-    df['year'] = df['year'].astype(int)
-    df.to_sql(
-        'rental_data',
-        engine,
-        if_exists='append',
-        index=False,
-        method='multi'
+from pipeline_metrics import METRICS
+from rental_core.dialogs import ask_open_files
+
+# rental_data columns and types, matching the CREATE TABLE below
+DB_COLUMNS = {
+    'property_id': 'VARCHAR(32)',
+    'property': 'TEXT',
+    'address': 'TEXT',
+    'city': 'TEXT',
+    'state': 'TEXT',
+    'zipcode': 'TEXT',
+    'phone': 'TEXT',
+    'unit': 'TEXT',
+    'beds': 'INTEGER',
+    'baths': 'NUMERIC',
+    'beds_baths': 'TEXT',
+    'sqft': 'INTEGER',
+    'price': 'NUMERIC',
+    'pricepersqft': 'NUMERIC',
+    'rentaltype': 'TEXT',
+    'haswasherdryer': 'BOOLEAN',
+    'hasairconditioning': 'BOOLEAN',
+    'haspool': 'BOOLEAN',
+    'hasspa': 'BOOLEAN',
+    'hasgym': 'BOOLEAN',
+    'hasevcharging': 'BOOLEAN',
+    'ispetfriendly': 'BOOLEAN',
+    'listingurl': 'TEXT',
+    'month': 'INTEGER',
+    'year': 'INTEGER',
+}
+PRIMARY_KEY = ['property_id', 'month', 'year']
+STAGE_TABLE = 'rental_data_stage'
+# Values the old pandas loader read as missing; stored as NULL
+NULL_TOKENS = ('', 'nan', 'NaN', 'N/A', 'None')
+DUPLICATES_SHOWN = 20  # repeated keys listed per file
+METRICS_RUN = 'loader'  # per-run metrics go to metrics/loader_<timestamp>.json
+
+def get_engine():
+    from dotenv import load_dotenv
+    from sqlalchemy import create_engine
+    # Load environment variables from .env file
+    load_dotenv()
+    db_user = os.getenv('DB_USER')
+    db_password = os.getenv('DB_PASSWORD')
+    db_host = os.getenv('DB_HOST')
+    db_port = os.getenv('DB_PORT')
+    db_name = os.getenv('DB_NAME')
+    return create_engine(
+        f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}'
     )
-    print(f'{os.path.basename(csv_file)} imported successfully!\n')
 
-print('All files loaded into rental_data table in rental_db!')
+def create_table(conn):
+    """CREATE TABLE IF NOT EXISTS rental_data, for a fresh local database."""
+    columns = [
+        f"{col} {sql_type}{' NOT NULL' if col in PRIMARY_KEY else ''}"
+        for col, sql_type in DB_COLUMNS.items()
+    ]
+    columns.append(f"PRIMARY KEY ({', '.join(PRIMARY_KEY)})")
+    with conn.cursor() as cur:
+        cur.execute("CREATE TABLE IF NOT EXISTS rental_data (\n    " + ',\n    '.join(columns) + "\n)")
+    conn.commit()
+
+def typed_column(col):
+    """SQL expression converting a TEXT staging column to its rental_data type."""
+    if col == 'property_id':
+        # The old to_sql loader read IDs through pandas as integers, dropping
+        # leading zeros; store them the same way so re-imports hit the same keys.
+        return "COALESCE(NULLIF(LTRIM(property_id, '0'), ''), '0')"
+    tokens = ', '.join(f"'{t}'" for t in NULL_TOKENS)
+    value = f"CASE WHEN {col} IN ({tokens}) THEN NULL ELSE {col} END"
+    sql_type = DB_COLUMNS[col]
+    if sql_type == 'INTEGER':
+        return f"({value})::numeric::integer"
+    if sql_type in ('NUMERIC', 'BOOLEAN'):
+        return f"({value})::{sql_type.lower()}"
+    return value
+
+def merge_sql(columns):
+    """INSERT ... ON CONFLICT DO UPDATE from the staging table, returning (inserted, updated)."""
+    col_list = ', '.join(columns)
+    key_list = ', '.join(PRIMARY_KEY)
+    updates = [c for c in columns if c not in PRIMARY_KEY]
+    on_conflict = (
+        'DO UPDATE SET ' + ', '.join(f'{c} = EXCLUDED.{c}' for c in updates)
+        if updates else 'DO NOTHING'
+    )
+    typed = ',\n            '.join(f'{typed_column(c)} AS {c}' for c in columns)
+    # DISTINCT ON keeps the first row of the file per key: ON CONFLICT cannot
+    # touch the same row twice in one statement. upsert_csv reports the keys
+    # this drops rows for (duplicate_keys_sql) before merging.
+    return f"""
+        WITH typed AS (
+            SELECT
+            {typed},
+            line
+            FROM {STAGE_TABLE}
+        ), upserted AS (
+            INSERT INTO rental_data ({col_list})
+            SELECT DISTINCT ON ({key_list}) {col_list}
+            FROM typed
+            ORDER BY {key_list}, line
+            ON CONFLICT ({key_list}) {on_conflict}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted)
+        FROM upserted
+    """
+
+def duplicate_keys_sql():
+    """Keys (as stored, after typing) on more than one staged row, with their row counts."""
+    key_list = ', '.join(PRIMARY_KEY)
+    typed = ', '.join(f'{typed_column(c)} AS {c}' for c in PRIMARY_KEY)
+    return f"""
+        SELECT {key_list}, COUNT(*)
+        FROM (SELECT {typed} FROM {STAGE_TABLE}) AS typed
+        GROUP BY {key_list}
+        HAVING COUNT(*) > 1
+        ORDER BY {key_list}
+    """
+
+def upsert_csv(conn, csv_path):
+    """
+    Load one processed CSV in a single transaction: COPY it into a temporary
+    all-TEXT staging table, then merge into rental_data. Safe to re-run;
+    existing (property_id, month, year) rows are updated in place. Only the
+    first row of a key repeated within the file is loaded.
+    Returns (inserted, updated, [(property_id, month, year, rows)] of the
+    repeated keys).
+    """
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        # Headers are the processor's mixed-case names; the table folds them to lower case
+        columns = [c.strip().lower() for c in next(csv.reader(f))]
+        unknown = [c for c in columns if c not in DB_COLUMNS]
+        if unknown:
+            raise ValueError(f"{os.path.basename(csv_path)}: columns not in rental_data: {unknown}")
+        missing = [c for c in PRIMARY_KEY if c not in columns]
+        if missing:
+            raise ValueError(f"{os.path.basename(csv_path)}: missing key columns: {missing}")
+        f.seek(0)
+
+        try:
+            with conn.cursor() as cur:
+                stage_cols = ', '.join(f'{c} TEXT' for c in columns)
+                cur.execute(
+                    f"CREATE TEMP TABLE {STAGE_TABLE} ({stage_cols}, line BIGSERIAL) ON COMMIT DROP"
+                )
+                cur.copy_expert(
+                    f"COPY {STAGE_TABLE} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, HEADER true)",
+                    f
+                )
+                cur.execute(duplicate_keys_sql())
+                duplicates = cur.fetchall()
+                cur.execute(merge_sql(columns))
+                inserted, updated = cur.fetchone()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return inserted, updated, duplicates
+
+def load_files(engine, file_paths):
+    conn = engine.raw_connection()
+    try:
+        for csv_file in file_paths:
+            print(f'Importing {csv_file} ...')
+            try:
+                with METRICS.stage('load'):
+                    inserted, updated, duplicates = upsert_csv(conn, csv_file)
+            except Exception:
+                METRICS.inc('errors', stage='load')
+                raise
+            METRICS.inc('files_loaded')
+            METRICS.inc('rows_inserted', inserted)
+            METRICS.inc('rows_updated', updated)
+            skipped = sum(rows - 1 for *_, rows in duplicates)
+            METRICS.inc('rows_skipped', skipped)
+            summary = f'{inserted} inserted, {updated} updated'
+            if duplicates:
+                summary += f', {skipped} duplicate rows skipped'
+                print(f'WARNING: {len(duplicates)} (property_id, month, year) keys repeat within '
+                      f'{os.path.basename(csv_file)}; only the first row of each was loaded:')
+                for property_id, month, year, rows in duplicates[:DUPLICATES_SHOWN]:
+                    print(f'  {property_id} {month}/{year}: {rows} rows')
+                if len(duplicates) > DUPLICATES_SHOWN:
+                    print(f'  ... and {len(duplicates) - DUPLICATES_SHOWN} more')
+            print(f'{os.path.basename(csv_file)} imported successfully: {summary}\n')
+    finally:
+        conn.close()
+
+def expand_paths(sources):
+    """Files, directories (every *.csv inside) and globs, in name order."""
+    paths = set()
+    for source in sources:
+        pattern = os.path.join(source, '*.csv') if os.path.isdir(source) else source
+        paths.update(glob.glob(pattern))
+    return sorted(paths)
+
+def main(sources=None):
+    file_paths = expand_paths(sources) if sources else ask_open_files("Select one or more rental CSV files to import")
+
+    if not file_paths:
+        print("No files selected. Exiting.")
+        return
+
+    try:
+        load_files(get_engine(), file_paths)
+    finally:
+        print(f'Run metrics written to {METRICS.write_json(METRICS_RUN)}')
+    print('All files loaded into rental_data table in rental_db!')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load processed rental CSVs into rental_data.')
+    parser.add_argument('paths', nargs='*',
+                        help='CSV files, directories or globs to load without the file dialog')
+    main(parser.parse_args().paths)
 
 '''
 CREATE TABLE rental_data (
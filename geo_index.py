@@ -0,0 +1,245 @@
+"""
+Offline geocoding and a spatial index over each snapshot, for radius and
+k-nearest queries without an external geocoding service.
+
+    python geo_index.py build SD_county_July_2025.csv --zips 2020_Gaz_zcta_national.txt
+    python geo_index.py build SD_county_July_2025.csv --zips zips.csv --gazetteer sd_addresses.csv
+    python geo_index.py near 2025-07 --address "675 9th Ave, San Diego, CA 92101" --k 10
+    python geo_index.py radius 2025-07 --lat 32.7157 --lon -117.1611 --km 1.5
+
+Reference files stay local:
+- ZIP centroids: the Census ZCTA gazetteer (GEOID, INTPTLAT, INTPTLONG) or any
+  CSV with zipcode/lat/lon columns.
+- Optional street-level gazetteer, e.g. an OpenAddresses county extract
+  (NUMBER, STREET, POSTCODE, LAT, LON).
+
+Each listing gets lat, lon and geo_precision: 'address' (exact house number),
+'street' (interpolated between the nearest known house numbers on the same
+street and ZIP), 'zip' (ZIP centroid) or missing. Coordinates are projected
+to kilometres around the snapshot's mean latitude and indexed with a scipy
+KD-tree. The geocoded listings are saved as GEO_DIR/<period>.csv with the
+projection in <period>.json; the tree is rebuilt from them on load in a few
+milliseconds.
+"""
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from property_resolver import split_address
+from rental_schema import text_column
+from snapshot_diff import snapshot_period
+
+GEO_DIR = "geo_index"
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LON = 111.320  # at the equator; scaled by cos(latitude)
+DEFAULT_K = 10
+# Accepted spellings of reference-file columns, first match wins
+ZIP_COLUMNS = {'zipcode': ['zipcode', 'zip', 'geoid', 'postcode', 'zcta5'],
+               'lat': ['lat', 'latitude', 'intptlat'], 'lon': ['lon', 'lng', 'longitude', 'intptlong']}
+GAZETTEER_COLUMNS = {'number': ['number', 'street_number', 'house_number'], 'street': ['street', 'street_name'],
+                     'zipcode': ['postcode', 'zipcode', 'zip'], 'lat': ['lat', 'latitude'],
+                     'lon': ['lon', 'lng', 'longitude']}
+
+
+def _pick_columns(df, spec, path):
+    columns = {c.strip().lower(): c for c in df.columns}
+    picked = {}
+    for name, options in spec.items():
+        found = next((columns[o] for o in options if o in columns), None)
+        if found is None:
+            raise ValueError(f"{path}: no {name} column (looked for {', '.join(options)})")
+        picked[name] = df[found]
+    return pd.DataFrame(picked)
+
+
+def read_reference(path, spec):
+    sep = '\t' if path.endswith('.txt') else ','  # Census gazetteer files are tab-separated
+    return _pick_columns(pd.read_csv(path, sep=sep, dtype=str, keep_default_na=False), spec, path)
+
+
+class Geocoder:
+    """ZIP centroids plus an optional street gazetteer, keyed like property_resolver's normalized addresses."""
+
+    def __init__(self, zip_path, gazetteer_path=None):
+        zips = read_reference(zip_path, ZIP_COLUMNS)
+        zips['zipcode'] = zips['zipcode'].str.strip().str.zfill(5)
+        self.zips = {z: (float(lat), float(lon)) for z, lat, lon in zips.itertuples(index=False)}
+        self.addresses = {}
+        self.streets = {}
+        if gazetteer_path:
+            points = read_reference(gazetteer_path, GAZETTEER_COLUMNS)
+            keys = [split_address(f"{n} {s}")[:2] for n, s in zip(points['number'], points['street'])]
+            points = points.assign(
+                number=[k[0] for k in keys], street=[k[1] for k in keys],
+                zipcode=points['zipcode'].str.strip().str[:5],
+                lat=pd.to_numeric(points['lat'], errors='coerce'), lon=pd.to_numeric(points['lon'], errors='coerce'),
+            ).dropna(subset=['lat', 'lon'])
+            points = points[points['number'].str.isdigit()]
+            for zipcode, number, street, lat, lon in points[['zipcode', 'number', 'street', 'lat', 'lon']].itertuples(index=False):
+                self.addresses[(zipcode, number, street)] = (lat, lon)
+            for (zipcode, street), group in points.groupby(['zipcode', 'street']):
+                numbers = group['number'].astype(int).to_numpy()
+                order = np.argsort(numbers)
+                self.streets[(zipcode, street)] = (numbers[order], group[['lat', 'lon']].to_numpy()[order])
+
+    def locate(self, address, zipcode):
+        """(lat, lon, precision) for one address; (nan, nan, None) when even the ZIP is unknown."""
+        number, street, _ = split_address(address)
+        if (zipcode, number, street) in self.addresses:
+            return (*self.addresses[(zipcode, number, street)], 'address')
+        if number and (zipcode, street) in self.streets:
+            numbers, coords = self.streets[(zipcode, street)]
+            # Linear interpolation along the street; clamped to the first/last known number
+            lat = np.interp(int(number), numbers, coords[:, 0])
+            lon = np.interp(int(number), numbers, coords[:, 1])
+            return lat, lon, 'street'
+        if zipcode in self.zips:
+            return (*self.zips[zipcode], 'zip')
+        return np.nan, np.nan, None
+
+    def geocode(self, df):
+        """Listings with lat, lon and geo_precision added; each distinct address is located once."""
+        columns = {c.lower(): c for c in df.columns}
+        address = df[columns['address']].astype('string').fillna('')
+        zipcode = text_column(df[columns['zipcode']]).str.zfill(5).fillna('') if 'zipcode' in columns \
+            else address.str.extract(r'(\d{5})(?!.*\d{5})', expand=False).fillna('')
+        pairs = pd.DataFrame({'address': address, 'zipcode': zipcode})
+        distinct = pairs.drop_duplicates()
+        located = pd.DataFrame(
+            [self.locate(a, z) for a, z in distinct.itertuples(index=False)],
+            columns=['lat', 'lon', 'geo_precision'], index=pd.MultiIndex.from_frame(distinct),
+        )
+        found = located.reindex(pd.MultiIndex.from_frame(pairs))
+        return df.assign(lat=found['lat'].to_numpy(), lon=found['lon'].to_numpy(),
+                         geo_precision=found['geo_precision'].to_numpy())
+
+
+def project(lat, lon, lat0):
+    """Equirectangular (x, y) in km around latitude lat0; accurate to well under 1% across a county."""
+    lat, lon = np.asarray(lat, dtype='float64'), np.asarray(lon, dtype='float64')
+    return np.column_stack([lon * KM_PER_DEGREE_LON * np.cos(np.radians(lat0)), lat * KM_PER_DEGREE_LAT])
+
+
+class SpatialIndex:
+    """KD-tree over one snapshot's geocoded listings (rows without coordinates are left out)."""
+
+    def __init__(self, listings, label, lat0=None):
+        from scipy.spatial import cKDTree
+        self.label = label
+        self.listings = listings[listings['lat'].notna()].reset_index(drop=True)
+        self.lat0 = float(self.listings['lat'].mean()) if lat0 is None else lat0
+        self.points = project(self.listings['lat'], self.listings['lon'], self.lat0)
+        self.tree = cKDTree(self.points)
+
+    def save(self, directory=GEO_DIR):
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.label)
+        self.listings.to_csv(f"{base}.csv.tmp", index=False)
+        with open(f"{base}.json.tmp", 'w') as f:
+            json.dump({'label': self.label, 'lat0': self.lat0, 'rows': len(self.listings),
+                       'precision': self.listings['geo_precision'].value_counts().to_dict()}, f, indent=1)
+        os.replace(f"{base}.csv.tmp", f"{base}.csv")
+        os.replace(f"{base}.json.tmp", f"{base}.json")
+        return base
+
+    @classmethod
+    def load(cls, label, directory=GEO_DIR):
+        base = os.path.join(directory, label)
+        with open(f"{base}.json") as f:
+            meta = json.load(f)
+        listings = pd.read_csv(f"{base}.csv", dtype={'property_id': str, 'zipcode': str, 'ZipCode': str})
+        return cls(listings, meta['label'], meta['lat0'])
+
+    def _rows(self, indexes, distances):
+        return self.listings.iloc[indexes].assign(distance_km=np.round(distances, 3)).reset_index(drop=True)
+
+    def nearest(self, lat, lon, k=DEFAULT_K):
+        """The k listings closest to (lat, lon), nearest first, with distance_km."""
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        if self.listings.empty:
+            return self._rows([], [])
+        k = min(k, len(self.listings))
+        distances, indexes = self.tree.query(project([lat], [lon], self.lat0)[0], k=k)
+        return self._rows(np.atleast_1d(indexes), np.atleast_1d(distances))
+
+    def within(self, lat, lon, km):
+        """All listings within km of (lat, lon), nearest first."""
+        if self.listings.empty:
+            return self._rows([], [])
+        point = project([lat], [lon], self.lat0)[0]
+        indexes = np.asarray(self.tree.query_ball_point(point, km), dtype=int)
+        distances = np.hypot(*(self.points[indexes] - point).T)
+        order = np.argsort(distances, kind='stable')
+        return self._rows(indexes[order], distances[order])
+
+    def neighbors(self, k=DEFAULT_K):
+        """(distances, indexes) of every listing's k nearest other listings, as arrays shaped (rows, k)."""
+        distances, indexes = self.tree.query(self.points, k=k + 1)
+        return distances[:, 1:], indexes[:, 1:]
+
+
+def build(path, geocoder, directory=GEO_DIR):
+    _, label = snapshot_period(path)
+    listings = geocoder.geocode(pd.read_csv(path, dtype={'property_id': str}))
+    index = SpatialIndex(listings, label)
+    base = index.save(directory)
+    counts = listings['geo_precision'].value_counts(dropna=False)
+    print(f"{os.path.basename(path)} -> {base}.csv: {len(index.listings)} of {len(listings)} listings located "
+          f"({', '.join(f'{n} {p}' for p, n in counts.items())})")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline geocoding and nearest-listing queries.")
+    parser.add_argument('--dir', default=GEO_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_cmd = commands.add_parser('build', help='geocode snapshots and save their spatial indexes')
+    build_cmd.add_argument('paths', nargs='+')
+    build_cmd.add_argument('--zips', required=True, help='ZIP centroid file (Census ZCTA gazetteer or zipcode/lat/lon CSV)')
+    build_cmd.add_argument('--gazetteer', help='street-level address points (number/street/postcode/lat/lon)')
+    for name, help_text in (('near', 'k nearest listings'), ('radius', 'listings within a distance')):
+        query = commands.add_parser(name, help=help_text)
+        query.add_argument('period', help="saved index label, e.g. 2025-07")
+        query.add_argument('--lat', type=float)
+        query.add_argument('--lon', type=float)
+        query.add_argument('--address', help='geocode this address instead of --lat/--lon (needs --zips)')
+        query.add_argument('--zips')
+        query.add_argument('--gazetteer')
+        if name == 'near':
+            query.add_argument('--k', type=int, default=DEFAULT_K)
+        else:
+            query.add_argument('--km', type=float, required=True)
+    args = parser.parse_args()
+    if args.command == 'near' and args.k < 1:
+        parser.error(f"--k must be at least 1, got {args.k}")
+
+    if args.command == 'build':
+        geocoder = Geocoder(args.zips, args.gazetteer)
+        for path in args.paths:
+            build(path, geocoder, args.dir)
+        return
+
+    index = SpatialIndex.load(args.period, args.dir)
+    lat, lon = args.lat, args.lon
+    if args.address:
+        if not args.zips:
+            parser.error("--address needs --zips")
+        zipcode = re.search(r'(\d{5})(?!.*\d{5})', args.address)
+        lat, lon, precision = Geocoder(args.zips, args.gazetteer).locate(args.address, zipcode.group(1) if zipcode else '')
+        if precision is None:
+            parser.error(f"could not locate {args.address!r}")
+        print(f"{args.address}: {lat:.5f}, {lon:.5f} ({precision})")
+    elif lat is None or lon is None:
+        parser.error("give --lat and --lon, or --address")
+    found = index.nearest(lat, lon, args.k) if args.command == 'near' else index.within(lat, lon, args.km)
+    columns = [c for c in found.columns if c.lower() in ('property', 'address', 'unit', 'beds', 'price', 'distance_km')]
+    print(found[columns].to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
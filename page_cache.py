@@ -0,0 +1,174 @@
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+CACHE_DIR = "page_cache"
+CACHE_MAX_BYTES = 2 * 1024 ** 3  # compressed bytes kept on disk before LRU eviction
+CACHE_TTL_DAYS = 7
+
+
+class PageCache:
+    """
+    On-disk cache of fetched page source.
+
+    Pages are gzip-compressed and stored once per content hash under
+    `root/ab/<sha256>.gz`, so identical pages fetched on different days share
+    a blob. A small sqlite index maps (url, fetch_date) to the blob and keeps
+    the last-access time used for size-bounded LRU eviction. Entries older than
+    the TTL are ignored, except in replay mode, which serves the newest copy of
+    a page regardless of age and never falls through to the network.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, ttl_days=CACHE_TTL_DAYS, replay=False):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_days = ttl_days
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url         TEXT NOT NULL,
+                fetch_date  TEXT NOT NULL,
+                blob        TEXT NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (url, fetch_date)
+            );
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+            CREATE INDEX IF NOT EXISTS entries_blob ON entries (blob);
+        """)
+        self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def _blob_path(self, blob):
+        return os.path.join(self.root, blob[:2], f"{blob}.gz")
+
+    def get(self, url):
+        """Return the newest cached source for url within the TTL, or None."""
+        query = "SELECT fetch_date, blob FROM entries WHERE url = ?"
+        params = [url]
+        if not self.replay:
+            cutoff = date.fromordinal(date.today().toordinal() - self.ttl_days).isoformat()
+            query += " AND fetch_date >= ?"
+            params.append(cutoff)
+        query += " ORDER BY fetch_date DESC LIMIT 1"
+
+        with self.lock:
+            row = self.db.execute(query, params).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            try:
+                with open(self._blob_path(row[1]), 'rb') as f:
+                    html = gzip.decompress(f.read()).decode('utf-8')
+            except OSError as e:
+                logging.warning(f"Dropping unreadable cache entry for {url}: {e}")
+                self.db.execute("DELETE FROM entries WHERE url = ? AND fetch_date = ?", (url, row[0]))
+                self._release(row[1])
+                self.db.commit()
+                self.misses += 1
+                return None
+            self.db.execute(
+                "UPDATE entries SET last_access = ? WHERE url = ? AND fetch_date = ?",
+                (time.time(), url, row[0])
+            )
+            self.db.commit()
+            self.hits += 1
+            return html
+
+    def put(self, url, html):
+        """Store today's copy of url, then evict least-recently used pages over the size bound."""
+        data = html.encode('utf-8')
+        blob = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(blob)
+        compressed = gzip.compress(data)
+
+        with self.lock:
+            if self.db.execute("SELECT 1 FROM blobs WHERE hash = ?", (blob,)).fetchone() is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(compressed)
+                os.replace(tmp_path, path)
+                self.db.execute("INSERT INTO blobs (hash, size) VALUES (?, ?)", (blob, len(compressed)))
+                self.total_bytes += len(compressed)
+            today = date.today().isoformat()
+            previous = self.db.execute(
+                "SELECT blob FROM entries WHERE url = ? AND fetch_date = ?", (url, today)
+            ).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries (url, fetch_date, blob, last_access) VALUES (?, ?, ?, ?)",
+                (url, today, blob, time.time())
+            )
+            if previous and previous[0] != blob:
+                self._release(previous[0])
+            self._evict()
+            self.db.commit()
+
+    def _release(self, blob):
+        # Remove a blob from disk once no entry points at it any more
+        if self.db.execute("SELECT 1 FROM entries WHERE blob = ? LIMIT 1", (blob,)).fetchone():
+            return
+        row = self.db.execute("SELECT size FROM blobs WHERE hash = ?", (blob,)).fetchone()
+        if row is None:
+            return
+        try:
+            os.remove(self._blob_path(blob))
+        except FileNotFoundError:
+            pass
+        self.db.execute("DELETE FROM blobs WHERE hash = ?", (blob,))
+        self.total_bytes -= row[0]
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes:
+            oldest = self.db.execute(
+                "SELECT url, fetch_date, blob FROM entries ORDER BY last_access LIMIT 1"
+            ).fetchone()
+            if oldest is None:
+                break
+            self.db.execute("DELETE FROM entries WHERE url = ? AND fetch_date = ?", oldest[:2])
+            self._release(oldest[2])
+
+    def purge_expired(self):
+        """Delete entries older than the TTL and any blobs left unreferenced."""
+        cutoff = date.fromordinal(date.today().toordinal() - self.ttl_days).isoformat()
+        with self.lock:
+            expired = self.db.execute(
+                "SELECT DISTINCT blob FROM entries WHERE fetch_date < ?", (cutoff,)
+            ).fetchall()
+            self.db.execute("DELETE FROM entries WHERE fetch_date < ?", (cutoff,))
+            for (blob,) in expired:
+                self._release(blob)
+            self.db.commit()
+
+    def iter_pages(self):
+        """Yield (url, html) for the newest cached copy of every URL."""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT url, blob, MAX(fetch_date) FROM entries GROUP BY url ORDER BY url"
+            ).fetchall()
+        for url, blob, _ in rows:
+            try:
+                with open(self._blob_path(blob), 'rb') as f:
+                    yield url, gzip.decompress(f.read()).decode('utf-8')
+            except OSError:
+                continue
+
+    def summary(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'bytes': self.total_bytes}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,211 @@
+"""
+Per-run pipeline metrics: counters, latency histograms and stage timings,
+written as JSON per run and optionally served in Prometheus text format.
+
+    from pipeline_metrics import METRICS
+    METRICS.inc('units', 12)
+    with METRICS.timer('driver_get_seconds', kind='detail'):
+        driver.get(url)
+    with METRICS.stage('clean'):
+        df = clean(df)
+    METRICS.write_json('scraper')      # metrics/scraper_<timestamp>.json
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_DIR = "metrics"
+METRICS_PREFIX = "rental_"  # Prometheus metric name prefix
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}' if pairs else ''
+
+
+class Metrics:
+    """
+    Thread-safe metrics for one run. Histograms keep cumulative counts per
+    LATENCY_BUCKETS bound plus count/sum/max; stage() accumulates wall time
+    per named stage (repeated or per-chunk stages add up).
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.counters = {}
+            self.histograms = {}
+            self.stages = {}
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {
+                    'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0, 'max': 0.0
+                }
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    hist['buckets'][i] += 1
+            hist['count'] += 1
+            hist['sum'] += seconds
+            hist['max'] = max(hist['max'], seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                stage = self.stages.setdefault(name, {'seconds': 0.0, 'runs': 0})
+                stage['seconds'] += elapsed
+                stage['runs'] += 1
+
+    def _quantile(self, hist, q):
+        # Upper bound of the bucket holding the q-th observation (max if beyond the last bucket)
+        rank = q * hist['count']
+        for bound, cumulative in zip(self.buckets, hist['buckets']):
+            if cumulative >= rank:
+                return min(bound, hist['max'])
+        return hist['max']
+
+    def snapshot(self):
+        """Everything recorded so far as a JSON-ready dict."""
+        with self.lock:
+            return {
+                'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+                'duration_seconds': round(time.time() - self.started, 3),
+                'stages': {name: {'seconds': round(s['seconds'], 6), 'runs': s['runs']}
+                           for name, s in self.stages.items()},
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                'histograms': [
+                    {
+                        'name': name, 'labels': dict(labels),
+                        'count': h['count'], 'sum': round(h['sum'], 6), 'max': round(h['max'], 6),
+                        'p50': self._quantile(h, 0.5), 'p90': self._quantile(h, 0.9), 'p99': self._quantile(h, 0.99),
+                        'buckets': dict(zip(map(str, self.buckets), h['buckets'])),
+                    }
+                    for (name, labels), h in sorted(self.histograms.items())
+                ],
+            }
+
+    def merge(self, snapshot):
+        """Add a snapshot() taken in another process (e.g. a batch worker) into this run."""
+        with self.lock:
+            for name, stage in snapshot['stages'].items():
+                mine = self.stages.setdefault(name, {'seconds': 0.0, 'runs': 0})
+                mine['seconds'] += stage['seconds']
+                mine['runs'] += stage['runs']
+            for counter in snapshot['counters']:
+                key = _key(counter['name'], counter['labels'])
+                self.counters[key] = self.counters.get(key, 0) + counter['value']
+            for other in snapshot['histograms']:
+                key = _key(other['name'], other['labels'])
+                hist = self.histograms.setdefault(
+                    key, {'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0, 'max': 0.0}
+                )
+                for i, bound in enumerate(self.buckets):
+                    hist['buckets'][i] += other['buckets'].get(str(bound), 0)
+                hist['count'] += other['count']
+                hist['sum'] += other['sum']
+                hist['max'] = max(hist['max'], other['max'])
+
+    def write_json(self, run_name, directory=METRICS_DIR):
+        """Write this run's metrics to <directory>/<run_name>_<timestamp>.json and return the path."""
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.fromtimestamp(self.started).strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(directory, f"{run_name}_{stamp}.json")
+        with open(path + '.tmp', 'w') as f:
+            json.dump(dict(self.snapshot(), run=run_name), f, indent=1)
+        os.replace(path + '.tmp', path)
+        return path
+
+    def prometheus_text(self):
+        """Current metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, dict(h, buckets=list(h['buckets']))) for key, h in self.histograms.items())
+            stages = sorted(self.stages.items())
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{METRICS_PREFIX}{name}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{_label_text(labels)} {value}")
+        for (name, labels), h in histograms:
+            metric = f"{METRICS_PREFIX}{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            for bound, cumulative in zip(self.buckets, h['buckets']):
+                lines.append(f"{metric}_bucket{_label_text(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{metric}_bucket{_label_text(labels, [('le', '+Inf')])} {h['count']}")
+            lines.append(f"{metric}_sum{_label_text(labels)} {h['sum']:.6f}")
+            lines.append(f"{metric}_count{_label_text(labels)} {h['count']}")
+        if stages:
+            lines.append(f"# TYPE {METRICS_PREFIX}stage_seconds_total counter")
+            for name, stage in stages:
+                lines.append(f'{METRICS_PREFIX}stage_seconds_total{{stage="{name}"}} {stage["seconds"]:.6f}')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serve GET /metrics in Prometheus text format from a daemon thread; returns the server."""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+METRICS = Metrics()
@@ -0,0 +1,328 @@
+"""
+Rent-pricing model: features from the processed (FINAL_COLS) layout, a
+versioned JSON artifact, batch scoring and a local prediction endpoint.
+
+    python price_model.py train SD_county_*.csv              # writes models/price_model_v<N>.json
+    python price_model.py score SD_county_July_2025.csv --out flagged.csv
+    python price_model.py serve --port 8765                  # POST /predict with JSON listings
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import queue
+import re
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from rental_schema import apply_schema, text_column
+
+MODEL_DIR = "models"
+MODEL_NAME = re.compile(r'price_model_v(\d+)\.json$')
+NUMERIC_FEATURES = ['beds', 'baths', 'sqft']
+FLAG_FEATURES = [
+    'haswasherdryer', 'hasairconditioning', 'haspool', 'hasspa',
+    'hasgym', 'hasevcharging', 'ispetfriendly'
+]
+CATEGORY_FEATURES = ['zipcode', 'rentaltype']
+TRAIN_MAX_PRICE = 6000  # same cut as the analysis notebook's df_clean_filtered
+MIN_CATEGORY_COUNT = 5  # rarer zip codes/rental types share the baseline
+RIDGE_ALPHA = 1.0
+MISPRICED_PCT = 25  # |actual - predicted| / predicted above this is flagged
+SERVE_PORT = 8765
+BATCH_MAX = 256
+BATCH_WAIT = 0.005  # seconds the endpoint waits to fill a batch
+PREDICT_TIMEOUT = 30  # seconds a request waits for its batch before a 503
+
+
+def feature_names(spec):
+    names = NUMERIC_FEATURES + ['sqft_missing'] + FLAG_FEATURES
+    for column in CATEGORY_FEATURES:
+        names += [f"{column}={value}" for value in spec['categories'][column]]
+    return names
+
+
+def build_features(df, spec):
+    """
+    Feature matrix for processed listings (any casing of the column names).
+    Missing numbers are filled with the training medians (sqft also gets a
+    missing flag); zip code and rental type are one-hot encoded against the
+    training vocabulary, unseen values encoding as all zeros.
+    """
+    df = apply_schema(df)
+    n = len(df)
+    blocks = []
+    for column in NUMERIC_FEATURES:
+        values = pd.to_numeric(df[column], errors='coerce') if column in df.columns else pd.Series(np.nan, index=df.index)
+        values = values.astype('float64').to_numpy(na_value=np.nan)
+        if column == 'sqft':
+            sqft_missing = np.isnan(values)
+        blocks.append(np.where(np.isnan(values), spec['medians'][column], values))
+    blocks.append(sqft_missing.astype('float64'))
+    for column in FLAG_FEATURES:
+        values = df[column].astype('boolean').fillna(False) if column in df.columns else pd.Series(False, index=df.index)
+        blocks.append(values.to_numpy(dtype='float64'))
+    numeric = np.column_stack(blocks) if n else np.empty((0, len(blocks)))
+
+    onehots = []
+    for column in CATEGORY_FEATURES:
+        vocabulary = spec['categories'][column]
+        values = text_column(df[column]) if column in df.columns else pd.Series(pd.NA, index=df.index, dtype='string')
+        codes = pd.Categorical(values, categories=vocabulary).codes
+        onehot = np.zeros((n, len(vocabulary)))
+        known = codes >= 0
+        onehot[np.flatnonzero(known), codes[known]] = 1.0
+        onehots.append(onehot)
+    return np.hstack([numeric] + onehots)
+
+
+def train_model(df, alpha=RIDGE_ALPHA, test_size=0.2, random_state=42):
+    """
+    Fit a ridge regression of price on the features. Listings without price
+    or sqft, or priced above TRAIN_MAX_PRICE, are left out as in the
+    notebook. Returns the artifact dict (coefficients, vocabulary, metrics).
+    """
+    from sklearn.linear_model import Ridge
+    from sklearn.metrics import mean_absolute_error, r2_score
+    from sklearn.model_selection import train_test_split
+
+    df = apply_schema(df)
+    df = df[df['price'].notna() & df['sqft'].notna() & (df['price'] <= TRAIN_MAX_PRICE)].reset_index(drop=True)
+    spec = {
+        'medians': {column: float(pd.to_numeric(df[column]).median()) for column in NUMERIC_FEATURES},
+        'categories': {},
+    }
+    for column in CATEGORY_FEATURES:
+        counts = text_column(df[column]).value_counts()
+        spec['categories'][column] = sorted(counts[counts >= MIN_CATEGORY_COUNT].index)
+
+    X = build_features(df, spec)
+    y = df['price'].to_numpy(dtype='float64')
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state)
+    held_out = Ridge(alpha=alpha).fit(X_train, y_train).predict(X_test)
+    model = Ridge(alpha=alpha).fit(X, y)
+    return {
+        'features': feature_names(spec),
+        'spec': spec,
+        'coef': model.coef_.tolist(),
+        'intercept': float(model.intercept_),
+        'alpha': alpha,
+        'metrics': {
+            'r2': float(r2_score(y_test, held_out)),
+            'mae': float(mean_absolute_error(y_test, held_out)),
+            'train_rows': int(len(df)),
+        },
+    }
+
+
+def model_versions(model_dir=MODEL_DIR):
+    versions = []
+    for path in glob.glob(os.path.join(model_dir, "price_model_v*.json")):
+        match = MODEL_NAME.search(path)
+        if match:
+            versions.append(int(match.group(1)))
+    return sorted(versions)
+
+
+def save_model(artifact, model_dir=MODEL_DIR):
+    """Write the artifact as the next version; earlier versions are kept."""
+    os.makedirs(model_dir, exist_ok=True)
+    version = (model_versions(model_dir) or [0])[-1] + 1
+    artifact = dict(artifact, version=version, trained_at=datetime.now().isoformat(timespec='seconds'))
+    path = os.path.join(model_dir, f"price_model_v{version}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(artifact, f, indent=1)
+    os.replace(tmp_path, path)
+    return path
+
+
+class PriceModel:
+    """A loaded artifact; scoring is one matrix-vector product, no sklearn needed."""
+
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.version = artifact.get('version')
+        self.spec = artifact['spec']
+        self.coef = np.asarray(artifact['coef'])
+        self.intercept = artifact['intercept']
+
+    @classmethod
+    def load(cls, version=None, model_dir=MODEL_DIR):
+        """Load a given version, or the newest one."""
+        versions = model_versions(model_dir)
+        if not versions:
+            raise FileNotFoundError(f"No price_model_v*.json in {model_dir}; run 'python price_model.py train' first.")
+        version = versions[-1] if version is None else version
+        with open(os.path.join(model_dir, f"price_model_v{version}.json")) as f:
+            return cls(json.load(f))
+
+    def predict(self, df):
+        return build_features(df, self.spec) @ self.coef + self.intercept
+
+    def score(self, df, mispriced_pct=MISPRICED_PCT):
+        """
+        Predicted price for every listing, with the gap to the asking price
+        and a flag for listings more than mispriced_pct off.
+        """
+        predicted = self.predict(df)
+        price = pd.to_numeric(df['price'] if 'price' in df.columns else df['Price'], errors='coerce')
+        gap_pct = ((price - predicted) / predicted * 100).round(1)
+        return df.assign(
+            predicted_price=predicted.round(0),
+            price_gap_pct=gap_pct,
+            mispriced=gap_pct.abs() > mispriced_pct,
+        )
+
+
+class MicroBatcher:
+    """
+    Collects concurrent prediction requests and scores them together: a
+    worker thread takes whatever is queued (up to BATCH_MAX rows, waiting at
+    most BATCH_WAIT for more) and runs one vectorized predict per batch.
+    Records are cast to the schema as they are submitted, so a malformed
+    request fails on its own; if a batch still fails, its requests are
+    rescored one by one and only the failing ones get the error.
+    """
+
+    def __init__(self, model, max_rows=BATCH_MAX, max_wait=BATCH_WAIT):
+        self.model = model
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.batches = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, records):
+        """
+        Queue a list of listing dicts; the Future resolves to their predicted
+        prices. Raises ValueError or TypeError for records that do not fit the
+        schema (e.g. a bed count too large for its column).
+        """
+        frame = apply_schema(pd.DataFrame(records))
+        future = Future()
+        self.requests.put((frame, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.requests.get()]
+            rows = len(batch[0][0])
+            while rows < self.max_rows:
+                try:
+                    item = self.requests.get(timeout=self.max_wait)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            self._score(batch)
+
+    def _score(self, batch):
+        self.batches += 1
+        try:
+            frame = pd.concat([frame for frame, _ in batch], ignore_index=True)
+            predicted = self.model.predict(frame) if len(frame) else np.empty(0)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            logging.warning(f"Batch of {len(batch)} requests failed ({e}); scoring them one by one")
+            for item in batch:
+                self._score([item])
+            return
+        start = 0
+        for frame, future in batch:
+            future.set_result(predicted[start:start + len(frame)].round(0).tolist())
+            start += len(frame)
+
+
+def make_handler(batcher):
+    class PredictHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != '/predict':
+                self.send_error(404)
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                records = body if isinstance(body, list) else [body]
+                predicted = batcher.submit(records).result(timeout=PREDICT_TIMEOUT)
+            except (ValueError, KeyError, TypeError) as e:
+                self.send_error(400, str(e))
+                return
+            except TimeoutError:
+                self.send_error(503, f"No prediction within {PREDICT_TIMEOUT}s; try again")
+                return
+            payload = json.dumps({'version': batcher.model.version, 'predicted_price': predicted}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            logging.debug(format, *args)
+
+    return PredictHandler
+
+
+class PredictServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # the socketserver default of 5 drops bursts of concurrent clients
+
+
+def serve(model, port=SERVE_PORT, host='127.0.0.1'):
+    server = PredictServer((host, port), make_handler(MicroBatcher(model)))
+    print(f"Serving price model v{model.version} on http://{host}:{port}/predict")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def read_listings(patterns):
+    paths = [path for pattern in patterns for path in sorted(glob.glob(pattern))]
+    return pd.concat([pd.read_csv(path, dtype={'property_id': str}) for path in paths], ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train, score with and serve the rent-pricing model.")
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    train = commands.add_parser('train', help='train on processed SD_county_*.csv files')
+    train.add_argument('paths', nargs='+')
+    score = commands.add_parser('score', help='score processed CSVs and report mispriced listings')
+    score.add_argument('paths', nargs='+')
+    score.add_argument('--out', help='write scored listings to this CSV')
+    score.add_argument('--version', type=int)
+    serve_cmd = commands.add_parser('serve', help='local HTTP prediction endpoint')
+    serve_cmd.add_argument('--port', type=int, default=SERVE_PORT)
+    serve_cmd.add_argument('--version', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        artifact = train_model(read_listings(args.paths))
+        path = save_model(artifact, args.model_dir)
+        metrics = artifact['metrics']
+        print(f"Saved {path}: R2 {metrics['r2']:.2f}, MAE ${metrics['mae']:.0f} on held-out listings "
+              f"({metrics['train_rows']} training rows)")
+    elif args.command == 'score':
+        model = PriceModel.load(args.version, args.model_dir)
+        scored = model.score(read_listings(args.paths))
+        print(f"Model v{model.version}: {int(scored['mispriced'].sum())} of {len(scored)} listings "
+              f"more than {MISPRICED_PCT}% off the predicted price")
+        if args.out:
+            scored.to_csv(args.out, index=False)
+    else:
+        serve(PriceModel.load(args.version, args.model_dir), args.port)
+
+
+if __name__ == '__main__':
+    main()
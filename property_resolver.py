@@ -0,0 +1,231 @@
+"""
+Cross-snapshot entity resolution: one canonical_id per rental unit across
+the whole history, even when the raw Address|Unit|SqFt key behind
+property_id changes ("Unit 0710" vs "#710", a sqft correction, "Avenue" vs "Ave").
+
+    python property_resolver.py SD_county_*.csv                      # build/extend property_index.csv
+    python property_resolver.py SD_county_August_2025.csv            # a new month: incremental update
+    python property_resolver.py SD_county_*.csv --out-dir resolved --dedupe
+
+Addresses and units are normalized to tokens; candidates are only compared
+within their block (ZipCode + street number), so matching never goes
+all-pairs. The index keeps every raw key seen with its canonical_id, so
+re-running on known months is a dictionary lookup and new months only
+resolve their new keys.
+"""
+import argparse
+import difflib
+import glob
+import os
+import re
+
+import pandas as pd
+
+from pipeline_metrics import METRICS
+from rental_core import deterministic_12_digit
+from snapshot_diff import snapshot_period
+
+INDEX_PATH = "property_index.csv"
+INDEX_COLUMNS = [
+    'property_key', 'canonical_id', 'zipcode', 'street_number', 'street', 'unit', 'sqft',
+    'first_seen', 'last_seen'
+]
+STREET_SIMILARITY = 0.85  # difflib ratio for two street names in one block to count as the same street
+SQFT_TOLERANCE = 0.15  # a known unit whose sqft moved more than this fraction is a different unit
+STREET_ABBREVIATIONS = {
+    'street': 'st', 'avenue': 'ave', 'av': 'ave', 'boulevard': 'blvd', 'drive': 'dr', 'road': 'rd',
+    'lane': 'ln', 'place': 'pl', 'court': 'ct', 'circle': 'cir', 'terrace': 'ter', 'parkway': 'pkwy',
+    'highway': 'hwy', 'trail': 'trl', 'square': 'sq', 'glen': 'gln', 'point': 'pt', 'camino': 'cam',
+    'north': 'n', 'south': 's', 'east': 'e', 'west': 'w',
+}
+UNIT_PREFIX = re.compile(r'^\s*(?:unit|apt|apartment|ste|suite|no\.?|number|#)\s*', re.IGNORECASE)
+ADDRESS_UNIT = re.compile(r'\s+(?:#|apt\b|unit\b|ste\b|suite\b)\s*(.*)$', re.IGNORECASE)
+# Normalized units that name a floor plan or waitlist rather than one apartment; these also need the same sqft
+GENERIC_UNIT = re.compile(r'^(?!.*\d)|^w-l-\d|^waitlist')
+MISSING = ('', 'n/a', 'nan', 'none')
+
+
+def normalize_unit(unit):
+    """'Unit 0710', '#710', 'Apt. 710' -> '710'; 'C-0926' / 'C0926' -> 'c-926'; missing -> ''."""
+    if unit is None or pd.isna(unit):
+        return ''
+    unit = str(unit).strip().lower()
+    previous = None
+    while unit != previous:  # 'Unit #710'
+        previous, unit = unit, UNIT_PREFIX.sub('', unit)
+    if unit in MISSING:
+        return ''
+    groups = re.findall(r'[a-z]+|\d+', unit)
+    return '-'.join(g.lstrip('0') or '0' if g.isdigit() else g for g in groups)
+
+
+def split_address(address):
+    """
+    (street number, normalized street, unit found in the address) from a
+    '675 9th Avenue #4, San Diego, CA 92101' style address.
+    """
+    if address is None or pd.isna(address):
+        return '', '', ''
+    street = str(address).split(',')[0].strip()
+    unit = ''
+    match = ADDRESS_UNIT.search(street)
+    if match:
+        street, unit = street[:match.start()], normalize_unit(match.group(1))
+    tokens = re.findall(r'[a-z0-9]+', street.lower())
+    number = tokens[0].lstrip('0') if tokens and tokens[0].isdigit() else ''
+    rest = tokens[1:] if number else tokens
+    return number, ' '.join(STREET_ABBREVIATIONS.get(t, t) for t in rest), unit
+
+
+def normalize_sqft(sqft):
+    try:
+        return str(int(float(sqft)))
+    except (TypeError, ValueError):
+        return ''
+
+
+def same_street(a, b):
+    return a == b or difflib.SequenceMatcher(None, a, b).ratio() >= STREET_SIMILARITY
+
+
+class PropertyIndex:
+    """
+    Raw key -> canonical_id for every unit seen so far, plus per-block
+    (ZipCode, street number) lists of normalized variants for matching keys
+    not seen before. load() / save() persist it as INDEX_PATH.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.rows = {}  # property_key -> index row dict
+        self.blocks = {}  # (zipcode, street_number) -> [index row dict]
+        self.ids = set()
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        index = cls(path)
+        if os.path.exists(path):
+            for row in pd.read_csv(path, dtype=str, keep_default_na=False).to_dict('records'):
+                index._add(row)
+        return index
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        pd.DataFrame(list(self.rows.values()), columns=INDEX_COLUMNS).to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+
+    def _add(self, row):
+        self.rows[row['property_key']] = row
+        self.ids.add(row['canonical_id'])
+        self.blocks.setdefault((row['zipcode'], row['street_number']), []).append(row)
+
+    def _match(self, zipcode, number, street, unit, sqft, period):
+        """
+        canonical_id of a known variant in the same block with the same unit
+        and a similar street. A different sqft rules a variant out when the
+        unit is generic, the change exceeds SQFT_TOLERANCE, or the variant is
+        in this same snapshot (two listings at once are two units).
+        """
+        for known in self.blocks.get((zipcode, number), ()):
+            if known['unit'] != unit or not same_street(known['street'], street):
+                continue
+            if known['sqft'] != sqft and (
+                GENERIC_UNIT.match(unit)
+                or known['last_seen'] == period
+                or (known['sqft'] and sqft
+                    and abs(int(known['sqft']) - int(sqft)) > SQFT_TOLERANCE * max(int(known['sqft']), int(sqft)))
+            ):
+                continue
+            return known['canonical_id']
+        return None
+
+    def _new_id(self, identity):
+        canonical_id, salt = deterministic_12_digit(identity), 0
+        while canonical_id in self.ids:  # a hash clash with a different unit
+            salt += 1
+            canonical_id = deterministic_12_digit(f"{identity}#{salt}")
+        return canonical_id
+
+    def resolve(self, df, period):
+        """
+        canonical_id for every row of a raw or processed snapshot (any column
+        casing), adding unseen keys to the index. `period` (e.g. '2025-07')
+        updates first_seen/last_seen.
+        """
+        df = df.rename(columns=str.lower)
+        text = lambda column: df[column].astype('string').fillna('').str.strip() if column in df.columns \
+            else pd.Series('', index=df.index, dtype='string')
+        address, unit, sqft = text('address'), text('unit'), text('sqft')
+        zipcode = text('zipcode').str.extract(r'(\d{5})', expand=False).fillna('')
+        zipcode = zipcode.mask(zipcode.eq(''), address.str.extract(r'(\d{5})(?!.*\d{5})', expand=False).fillna(''))
+        sqft = sqft.map(normalize_sqft)
+        keys = (address.str.lower() + '|' + unit.str.lower() + '|' + sqft).astype(object)
+        distinct = pd.DataFrame({'key': keys, 'address': address, 'unit': unit, 'sqft': sqft, 'zipcode': zipcode})
+
+        distinct = distinct.drop_duplicates('key')
+        seen = distinct['key'].isin(self.rows.keys()).to_numpy()
+        # Mark known keys first, so new keys see every variant present in this snapshot
+        for key in distinct['key'][seen]:
+            known = self.rows[key]
+            known['first_seen'] = min(known['first_seen'], period)
+            known['last_seen'] = max(known['last_seen'], period)
+
+        counts = {'exact': int(seen.sum()), 'normalized': 0, 'new': 0}
+        for row in distinct[~seen].itertuples(index=False):
+            number, street, address_unit = split_address(row.address)
+            unit_norm = normalize_unit(row.unit) or address_unit
+            canonical_id = self._match(row.zipcode, number, street, unit_norm, row.sqft, period)
+            if canonical_id is None:
+                counts['new'] += 1
+                canonical_id = self._new_id(f"{row.zipcode}|{number}|{street}|{unit_norm}|{row.sqft}")
+            else:
+                counts['normalized'] += 1
+            self._add({
+                'property_key': row.key, 'canonical_id': canonical_id, 'zipcode': row.zipcode,
+                'street_number': number, 'street': street, 'unit': unit_norm, 'sqft': row.sqft,
+                'first_seen': period, 'last_seen': period,
+            })
+        for how, n in counts.items():
+            METRICS.inc('canonical_keys', n, how=how)
+        self.last_counts = counts
+        return keys.map(lambda key: self.rows[key]['canonical_id']).rename('canonical_id')
+
+
+def resolve_files(paths, index, out_dir=None, dedupe=False):
+    """Resolve snapshot files oldest first, printing per-file counts; optionally write copies with canonical_id."""
+    for _, label, path in sorted((*snapshot_period(path), path) for path in paths):
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        canonical = index.resolve(df, label)
+        repeats = int(canonical.duplicated().sum())
+        counts = index.last_counts
+        print(
+            f"{os.path.basename(path)} ({label}): {len(df)} rows, {counts['exact']} known keys, "
+            f"{counts['normalized']} matched after normalization, {counts['new']} new units, "
+            f"{repeats} rows repeat a unit in the same snapshot"
+        )
+        if out_dir:
+            df.insert(0, 'canonical_id', canonical.values)
+            if dedupe:
+                df = df[~canonical.duplicated().values]
+            os.makedirs(out_dir, exist_ok=True)
+            df.to_csv(os.path.join(out_dir, os.path.basename(path)), index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assign canonical unit IDs across rental snapshots.")
+    parser.add_argument('paths', nargs='+', help='raw or processed snapshot CSVs (globs allowed)')
+    parser.add_argument('--index', default=INDEX_PATH, help='persistent index to read and update')
+    parser.add_argument('--out-dir', help='write copies of the inputs with a canonical_id column here')
+    parser.add_argument('--dedupe', action='store_true',
+                        help='in the copies, keep one row per canonical_id per snapshot')
+    args = parser.parse_args()
+
+    index = PropertyIndex.load(args.index)
+    known = len(index.ids)
+    resolve_files([path for pattern in args.paths for path in glob.glob(pattern)], index, args.out_dir, args.dedupe)
+    index.save()
+    print(f"{args.index}: {len(index.ids)} units ({len(index.ids) - known} new), {len(index.rows)} raw keys")
+
+
+if __name__ == '__main__':
+    main()
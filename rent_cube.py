@@ -0,0 +1,245 @@
+"""
+Precomputed monthly rent rollups, so summaries like
+df.groupby('City')['Price'].agg(['count', 'mean', 'median']) become lookups.
+
+    python rent_cube.py add SD_county_*.csv              # add/replace months from processed CSVs
+    python rent_cube.py update --store snapshot_store    # compute months new or changed in the store
+    python rent_cube.py show city beds --last 6
+"""
+import argparse
+import glob
+import os
+from itertools import combinations
+
+import pandas as pd
+
+from rental_schema import apply_schema
+
+CUBE_DIR = "rent_cube"
+AMENITY_DIMS = [
+    'haswasherdryer', 'hasairconditioning', 'haspool', 'hasspa',
+    'hasgym', 'hasevcharging', 'ispetfriendly'
+]
+DIM_DTYPES = {
+    'beds': 'Int8',
+    'rentaltype': 'string',
+    'city': 'string',
+    'zipcity': 'string',
+    **{col: 'boolean' for col in AMENITY_DIMS},
+}
+DIMS = list(DIM_DTYPES)
+# Every single dimension, every pair of the non-amenity dimensions, and each
+# amenity split by beds; () is the all-listings total.
+GROUPINGS = (
+    [()]
+    + [(dim,) for dim in DIMS]
+    + list(combinations(['beds', 'rentaltype', 'city', 'zipcity'], 2))
+    + [('beds', amenity) for amenity in AMENITY_DIMS]
+)
+
+
+def grouping_name(dims):
+    return '|'.join(sorted(dims))
+
+
+def month_rollups(df):
+    """
+    Rollups for one month of processed data: per grouping cell the listing
+    count and price sum (mergeable across months) in `cells`, and the price
+    value counts medians are computed from in `prices`. Listings without a
+    price are left out, as pandas count/mean/median would.
+    """
+    df = apply_schema(df)
+    df = df[df['price'].notna()]
+    frame = pd.DataFrame({
+        'beds': df['beds'],
+        'rentaltype': df['rentaltype'].astype('string'),
+        'city': df['city'].astype('string'),
+        'zipcity': df['zipcode'].astype('string') + ' - ' + df['city'].astype('string'),
+        **{col: df[col] for col in AMENITY_DIMS},
+        'price': df['price'],
+    })
+
+    cells, prices = [], []
+    for dims in GROUPINGS:
+        keys = list(dims)
+        if keys:
+            counts = frame.groupby(keys + ['price'], observed=True).size().rename('n').reset_index()
+        else:
+            counts = frame.groupby('price').size().rename('n').reset_index()
+        counts['grouping'] = grouping_name(dims)
+        counts['amount'] = counts['price'] * counts['n']
+        prices.append(counts.drop(columns='amount'))
+        by = keys + ['grouping'] if keys else ['grouping']
+        cells.append(counts.groupby(by, observed=True).agg(
+            count=('n', 'sum'), sum=('amount', 'sum'),
+            min=('price', 'min'), max=('price', 'max')
+        ).reset_index())
+    return _with_dims(pd.concat(cells, ignore_index=True)), _with_dims(pd.concat(prices, ignore_index=True))
+
+
+def _with_dims(df):
+    # Dimensions a grouping does not use are NA in its rows
+    for dim, dtype in DIM_DTYPES.items():
+        df[dim] = df[dim].astype(dtype) if dim in df.columns else pd.Series(pd.NA, index=df.index, dtype=dtype)
+    return df[['grouping'] + DIMS + [c for c in df.columns if c not in DIMS and c != 'grouping']]
+
+
+def weighted_median(prices, keys):
+    """Median price per cell from (keys..., price, n) value counts; same as Series.median."""
+    prices = prices.sort_values(keys + ['price'])
+    group = prices.groupby(keys, sort=False, observed=True)['n']
+    seen = group.cumsum()
+    total = group.transform('sum')
+    # 1-based positions of the two middle values (the same one when total is odd)
+    lower = prices[seen >= (total + 1) // 2].groupby(keys, observed=True)['price'].first()
+    upper = prices[seen >= total // 2 + 1].groupby(keys, observed=True)['price'].first()
+    return ((lower + upper) / 2).rename('median')
+
+
+class RentCube:
+    """
+    Monthly rollups kept as <root>/<YYYY-MM>.cells.parquet and .prices.parquet.
+
+    Months are computed once, when they arrive; summary() merges the stored
+    building blocks for the months asked for (counts and sums add up, price
+    value counts add up for the median) without touching listing rows.
+    """
+
+    def __init__(self, root=CUBE_DIR):
+        self.root = root
+        self._loaded = None
+
+    def _path(self, year, month, table):
+        return os.path.join(self.root, f"{int(year):04d}-{int(month):02d}.{table}.parquet")
+
+    def months(self):
+        """Stored (year, month) pairs, oldest first."""
+        found = []
+        for path in glob.glob(os.path.join(self.root, "*.cells.parquet")):
+            year, month = os.path.basename(path).split('.')[0].split('-')
+            found.append((int(year), int(month)))
+        return sorted(found)
+
+    def add_month(self, df, year, month):
+        """Compute and store one month's rollups, replacing any earlier copy."""
+        os.makedirs(self.root, exist_ok=True)
+        for table, rollup in zip(('cells', 'prices'), month_rollups(df)):
+            path = self._path(year, month, table)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            rollup.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        self._loaded = None
+
+    def add_csv(self, path):
+        """Add a processed SD_county_<Month>_<Year>.csv; month/year come from its columns."""
+        df = apply_schema(pd.read_csv(path))
+        months = df[['year', 'month']].drop_duplicates()
+        if len(months) != 1:
+            raise ValueError(f"{os.path.basename(path)}: expected one month, found {len(months)}")
+        year, month = (int(v) for v in months.iloc[0])
+        self.add_month(df, year, month)
+        return year, month
+
+    def update(self, store):
+        """
+        Compute the months of a snapshot_store.SnapshotStore that are missing
+        here or were rewritten since their rollups were stored.
+        """
+        updated = []
+        for year, month in store.partitions():
+            source = os.path.join(store._partition_dir(year, month), "data.parquet")
+            target = self._path(year, month, 'cells')
+            if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+                continue
+            self.add_month(store.read(since=(year, month), until=(year, month)), year, month)
+            updated.append((year, month))
+        return updated
+
+    def _load(self):
+        if self._loaded is None:
+            tables = {}
+            for table in ('cells', 'prices'):
+                frames = []
+                for year, month in self.months():
+                    frame = pd.read_parquet(self._path(year, month, table))
+                    frame['year'], frame['month'] = year, month
+                    frames.append(frame)
+                tables[table] = pd.concat(frames, ignore_index=True) if frames else None
+            self._loaded = tables
+        return self._loaded['cells'], self._loaded['prices']
+
+    def summary(self, by=(), last_months=None, since=None, until=None, per_month=False):
+        """
+        count / mean / median of price for a stored grouping, e.g.
+        summary(['city', 'beds'], last_months=6). Months are merged unless
+        per_month=True, which keeps a row per (year, month) as well.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        name = grouping_name(by)
+        if name not in {grouping_name(dims) for dims in GROUPINGS}:
+            raise KeyError(f"No rollup for {by}; stored groupings: {[list(dims) for dims in GROUPINGS]}")
+
+        keys = self.months()
+        if last_months is not None:
+            keys = keys[-last_months:] if last_months > 0 else []
+        if since is not None:
+            keys = [k for k in keys if k >= tuple(since)]
+        if until is not None:
+            keys = [k for k in keys if k <= tuple(until)]
+        columns = (['year', 'month'] if per_month else []) + by + ['count', 'mean', 'median']
+        if not keys:
+            return pd.DataFrame(columns=columns)
+
+        cells, prices = self._load()
+        wanted = pd.MultiIndex.from_tuples(keys, names=['year', 'month'])
+
+        def select(table):
+            rows = table[table['grouping'] == name]
+            return rows[pd.MultiIndex.from_frame(rows[['year', 'month']]).isin(wanted)]
+
+        group_keys = (['year', 'month'] if per_month else []) + by
+        if not group_keys:
+            cells, prices = select(cells).assign(_all=0), select(prices).assign(_all=0)
+            group_keys = ['_all']
+        else:
+            cells, prices = select(cells), select(prices)
+
+        totals = cells.groupby(group_keys)[['count', 'sum']].sum()
+        result = pd.DataFrame({'count': totals['count'], 'mean': totals['sum'] / totals['count']})
+        prices = prices.groupby(group_keys + ['price'])['n'].sum().reset_index()
+        result = result.join(weighted_median(prices, group_keys)).reset_index()
+        return result[columns]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain and query the monthly rent rollups.")
+    parser.add_argument('--cube', default=CUBE_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help='add months from processed SD_county_*.csv files')
+    add.add_argument('paths', nargs='+')
+    update = commands.add_parser('update', help='add months new or changed in a snapshot store')
+    update.add_argument('--store', default='snapshot_store')
+    show = commands.add_parser('show', help='print a summary, e.g. "show city beds --last 6"')
+    show.add_argument('by', nargs='*')
+    show.add_argument('--last', type=int, default=None)
+    show.add_argument('--per-month', action='store_true')
+    args = parser.parse_args()
+
+    cube = RentCube(args.cube)
+    if args.command == 'add':
+        for pattern in args.paths:
+            for path in sorted(glob.glob(pattern)):
+                year, month = cube.add_csv(path)
+                print(f"{os.path.basename(path)} -> {year}-{month:02d}")
+    elif args.command == 'update':
+        from snapshot_store import SnapshotStore
+        updated = cube.update(SnapshotStore(args.store))
+        print(f"Updated {len(updated)} months: {', '.join(f'{y}-{m:02d}' for y, m in updated) or 'none'}")
+    else:
+        with pd.option_context('display.max_rows', 200, 'display.width', 160):
+            print(cube.summary(args.by, last_months=args.last, per_month=args.per_month))
+
+
+if __name__ == '__main__':
+    main()
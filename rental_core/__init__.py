@@ -0,0 +1,51 @@
+"""
+Code shared by scraper.py, scrape_n_clean.py and rental_data_processor.py.
+
+    from rental_core import clean_and_finalize_dataframe, load_id_registry
+    from rental_core.browser import LazyDriver          # selenium loads on first use
+    from rental_core.dialogs import ask_month_year      # tkinter loads on first use
+
+- cleaning: raw-unit cleaning, property_id hashing, month and DB column helpers
+- browser: Edge WebDriver setup and adaptive render waits
+- dialogs: Tk file and month pickers, with console prompts where Tk is unavailable
+
+Nothing heavy loads at import: pandas comes with the first cleaning name used,
+and selenium, tkinter and the database drivers are imported by the functions
+that use them, so tools that never open a browser or a window start quickly
+and run on headless servers.
+"""
+# Exported from rental_core.cleaning on first access, so importing only
+# rental_core.dialogs or rental_core.browser does not load pandas
+__all__ = [
+    'ID_REGISTRY_PATH',
+    'MONTH_MAP',
+    'MONTHS',
+    'SNAPSHOT_COLUMNS',
+    'YEARS',
+    'add_month_year_columns',
+    'beds_baths_label',
+    'clean_and_finalize_chunks',
+    'clean_and_finalize_dataframe',
+    'clean_data',
+    'deterministic_12_digit',
+    'extract_city_state',
+    'extract_city_state_columns',
+    'extract_low_price',
+    'finalize_for_db',
+    'find_id_collisions',
+    'generate_property_ids',
+    'load_id_registry',
+    'output_name',
+    'price_per_sqft',
+    'property_keys',
+    'save_id_registry',
+    'smart_address_title',
+    'smart_address_title_column',
+]
+
+
+def __getattr__(name):
+    if name in __all__:
+        from rental_core import cleaning
+        return getattr(cleaning, name)
+    raise AttributeError(f"module 'rental_core' has no attribute {name!r}")
@@ -0,0 +1,118 @@
+"""
+Edge WebDriver setup and render waits for the scrapers. selenium and
+webdriver_manager are imported on first use, so importing this module (or
+anything that imports it) does not need a browser stack.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from pipeline_metrics import METRICS
+
+HEADLESS = True
+WAIT_TIME = 4  # upper bound (seconds) on waiting for a page to render
+WAIT_MIN_TIMEOUT = 0.5
+WAIT_TIMEOUT_FACTOR = 3  # adaptive timeout = factor x p90 of recent waits
+WAIT_SAMPLES = 200
+
+
+def init_driver():
+    from selenium import webdriver
+    from selenium.webdriver.edge.options import Options
+    from selenium.webdriver.edge.service import Service
+    from webdriver_manager.microsoft import EdgeChromiumDriverManager
+
+    options = Options()
+    if HEADLESS:
+        options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("user-agent=Mozilla/5.0")
+    service = Service(EdgeChromiumDriverManager().install(), log_output=os.devnull)
+    return webdriver.Edge(service=service, options=options)
+
+class AdaptiveWait:
+    """
+    Waits until the elements we parse are present instead of sleeping a fixed
+    WAIT_TIME. Each wait is timed per page kind, and the timeout follows the
+    observed latency: WAIT_TIMEOUT_FACTOR x p90 of recent successful waits,
+    clamped to [WAIT_MIN_TIMEOUT, WAIT_TIME]. Shared safely by DriverPool workers.
+    """
+
+    def __init__(self, max_timeout=WAIT_TIME, samples=WAIT_SAMPLES):
+        self.max_timeout = max_timeout
+        self.samples = samples
+        self.history = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def timeout(self, kind):
+        with self.lock:
+            recent = sorted(self.history.get(kind, ()))
+        if len(recent) < 10:
+            return self.max_timeout
+        p90 = recent[int(0.9 * (len(recent) - 1))]
+        return min(self.max_timeout, max(WAIT_MIN_TIMEOUT, WAIT_TIMEOUT_FACTOR * p90))
+
+    def wait(self, driver, kind, selectors):
+        """Block until every CSS selector matches; returns False on timeout."""
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        timeout = self.timeout(kind)
+        start = time.perf_counter()
+        try:
+            WebDriverWait(driver, timeout, poll_frequency=0.1).until(EC.all_of(
+                *(EC.presence_of_element_located((By.CSS_SELECTOR, sel)) for sel in selectors)
+            ))
+            ready = True
+        except TimeoutException:
+            ready = False
+            logging.debug(f"{kind} page not ready after {timeout:.2f}s: {driver.current_url}")
+        elapsed = time.perf_counter() - start
+        METRICS.observe('page_wait_seconds', elapsed, kind=kind)
+        if not ready:
+            METRICS.inc('page_wait_timeouts', kind=kind)
+
+        with self.lock:
+            stats = self.stats.setdefault(kind, {'waits': 0, 'timeouts': 0, 'total': 0.0, 'max': 0.0})
+            stats['waits'] += 1
+            stats['total'] += elapsed
+            stats['max'] = max(stats['max'], elapsed)
+            if ready:
+                self.history.setdefault(kind, deque(maxlen=self.samples)).append(elapsed)
+            else:
+                stats['timeouts'] += 1
+        return ready
+
+    def summary(self):
+        with self.lock:
+            return {
+                kind: {
+                    'waits': s['waits'],
+                    'timeouts': s['timeouts'],
+                    'mean': round(s['total'] / s['waits'], 3),
+                    'max': round(s['max'], 3),
+                }
+                for kind, s in self.stats.items()
+            }
+
+class LazyDriver:
+    """WebDriver stand-in that only starts the browser on first use."""
+
+    def __init__(self):
+        self._driver = None
+
+    def __getattr__(self, name):
+        if self._driver is None:
+            self._driver = init_driver()
+        return getattr(self._driver, name)
+
+    def quit(self):
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
@@ -0,0 +1,259 @@
+"""
+Cleaning and property_id generation shared by scraper.py, scrape_n_clean.py
+and rental_data_processor.py.
+
+    raw = scraper.scrape_listings(driver)                # one row per unit, text as scraped
+    snapshot = clean_data(raw)                           # san_diego_county_rentals_<date>.csv
+    df = clean_and_finalize_dataframe(snapshot, load_id_registry())
+    df = finalize_for_db(df, 'July', '2025')             # SD_county_July_2025.csv
+"""
+import hashlib
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from pipeline_metrics import METRICS
+from rental_schema import COLUMN_MAPPING, FINAL_COLS
+
+MONTH_MAP = {
+    'January': 1, 'February': 2, 'March': 3, 'April': 4,
+    'May': 5, 'June': 6, 'July': 7, 'August': 8,
+    'September': 9, 'October': 10, 'November': 11, 'December': 12
+}
+MONTHS = list(MONTH_MAP.keys())
+YEARS = [str(y) for y in range(2020, 2031)]
+ID_REGISTRY_PATH = "property_id_registry.csv"
+# Columns of the scraper's snapshot CSV, in order
+SNAPSHOT_COLUMNS = [
+    'Property', 'Address', 'City', 'State', 'ZipCode', 'Phone',
+    'Unit', 'Beds', 'Baths', 'Beds_Baths', 'SqFt', 'Price', 'PricePerSqFt',
+    'RentalType',
+    'HasWasherDryer', 'HasAirConditioning', 'HasPool', 'HasSpa',
+    'HasGym', 'HasEVCharging',
+    'IsPetFriendly',
+    'PriceRange',  # the index placard's price text, compared by incremental runs
+    'ListingURL'
+]
+# ', City, ST 12345' and ', ST 12345'; the state may be any case and is upper-cased
+CITY_STATE = r',\s*([^,]+),\s*([A-Z]{2})\s*\d{5}'
+STATE_ONLY = r',\s*([A-Z]{2})\s*\d{5}'
+
+
+def extract_low_price(price):
+    """'$2,100 - $3,450' -> 2100.0; None when there is no plain price."""
+    if pd.isna(price):
+        return None
+    price = re.sub(r'[^\d\-]', '', str(price))
+    return float(price.split('-')[0]) if '-' in price else float(price) if price.isdigit() else None
+
+def smart_address_title(s):
+    """Standardize address/unit formatting."""
+    if pd.isnull(s):
+        return s
+    s = str(s).strip().title()
+    s = re.sub(r'(\d+)(St|Nd|Rd|Th)\b', lambda m: m.group(1) + m.group(2).lower(), s)
+    return s
+
+def smart_address_title_column(col):
+    """Vectorized smart_address_title over a whole column; nulls are left as-is."""
+    titled = col.astype(str).str.strip().str.title().str.replace(
+        r'(\d+)(St|Nd|Rd|Th)\b', lambda m: m.group(1) + m.group(2).lower(), regex=True
+    )
+    return titled.where(col.notnull(), col)
+
+def deterministic_12_digit(s):
+    """Generate deterministic 12-digit property_id (last 12 decimal digits of the SHA-256)."""
+    h = int.from_bytes(hashlib.sha256(s.encode()).digest(), 'big')
+    return f"{h % 10**12:012d}"
+
+def extract_city_state(address):
+    """
+    Extract City and State robustly from US-style addresses.
+    Handles:
+      - "123 Main St, San Diego, CA 92101"
+      - "123 Main St, CA 92101"
+      - "123 Main St, 92101"
+      - and missing values gracefully.
+    """
+    if pd.isnull(address):
+        return pd.Series([np.nan, np.nan])
+    m = re.search(CITY_STATE, address, re.IGNORECASE)
+    if m:
+        return pd.Series([m.group(1).strip(), m.group(2).strip().upper()])
+    m2 = re.search(STATE_ONLY, address, re.IGNORECASE)
+    if m2:
+        return pd.Series([np.nan, m2.group(1).strip().upper()])
+    return pd.Series([np.nan, np.nan])
+
+def extract_city_state_columns(address):
+    """Vectorized extract_city_state: returns a (City, State) DataFrame."""
+    full = address.str.extract(CITY_STATE, flags=re.IGNORECASE)
+    state_only = address.str.extract(STATE_ONLY, flags=re.IGNORECASE)[0]
+    matched = full[0].notnull()
+    city = full[0].str.strip()
+    state = full[1].where(matched, state_only).str.strip().str.upper()
+    # infer_objects: an all-missing column comes back float64, as with the row-wise apply
+    return pd.DataFrame({'City': city, 'State': state}, index=address.index).infer_objects()
+
+def price_per_sqft(price, sqft):
+    """Price / SqFt rounded to 2 places, NaN where either is missing or SqFt <= 0."""
+    valid = price.notnull() & sqft.notnull() & (sqft > 0)
+    if not valid.any():
+        return pd.Series([None] * len(price), index=price.index, dtype=object)
+    ratio = (price / sqft).where(valid)
+    rounded = ratio.round(2)
+    # np.round scales by 100 and can land on the other side of a tie from
+    # Python's round(); redo the near-tie values with round() to match exactly.
+    near_tie = ((ratio * 100) % 1 - 0.5).abs() < 1e-6
+    rounded[near_tie] = [round(x, 2) for x in ratio[near_tie]]
+    return rounded
+
+def count_label(col):
+    """Whole-number text for each value (truncated like int()), 'N/A' where missing."""
+    labels = pd.Series('N/A', index=col.index, dtype=object)
+    present = col.notnull()
+    labels[present] = np.trunc(col[present].astype(float)).astype('int64').astype(str)
+    return labels
+
+def beds_baths_label(beds, baths):
+    """Vectorized '<beds> Bed / <baths> Bath' label."""
+    return count_label(beds) + ' Bed / ' + count_label(baths) + ' Bath'
+
+def parse_sqft(col):
+    """'1,005 sq ft' -> 1005; anything without digits -> NaN."""
+    return pd.to_numeric(col.astype(str).str.replace(',', '').str.extract(r'(\d+)', expand=False), errors='coerce')
+
+def clean_data(df):
+    """Turn raw scraped units (text as on the page) into the snapshot CSV layout, SNAPSHOT_COLUMNS."""
+    df['Price'] = df['Price'].apply(extract_low_price)
+    df['SqFt'] = parse_sqft(df['SqFt'])
+    df['Beds'] = pd.to_numeric(df['Beds'], errors='coerce')
+    df['Baths'] = pd.to_numeric(df['Baths'], errors='coerce')
+    df['ZipCode'] = df['Address'].str.extract(r'(\d{5})(?!.*\d{5})')
+    df[['City', 'State']] = extract_city_state_columns(df['Address'])
+    df['PricePerSqFt'] = price_per_sqft(df['Price'], df['SqFt'])
+    df['Beds_Baths'] = beds_baths_label(df['Beds'], df['Baths'])
+    return df[SNAPSHOT_COLUMNS]
+
+def load_id_registry(path=ID_REGISTRY_PATH):
+    """property_key -> property_id map kept from earlier runs (empty if none yet)."""
+    if not os.path.exists(path):
+        return {}
+    registry = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return dict(zip(registry['property_key'], registry['property_id']))
+
+def save_id_registry(registry, path=ID_REGISTRY_PATH):
+    pd.DataFrame({
+        'property_key': list(registry.keys()),
+        'property_id': list(registry.values())
+    }).to_csv(path, index=False)
+
+def property_keys(df):
+    """The 'Address|Unit|SqFt' key each property_id is hashed from (cleaned columns)."""
+    return df['Address'].fillna('') + '|' + df['Unit'].fillna('') + '|' + df['SqFt'].fillna('').astype(str)
+
+def generate_property_ids(keys, registry):
+    """
+    Batched deterministic_12_digit: each distinct key is hashed once and
+    memoized in `registry`, so keys seen in earlier months are not rehashed.
+    """
+    new_keys = [k for k in pd.unique(keys) if k not in registry]
+    registry.update(zip(new_keys, map(deterministic_12_digit, new_keys)))
+    METRICS.inc('property_ids_new', len(new_keys))
+    return keys.map(registry)
+
+def find_id_collisions(registry):
+    """Distinct property keys that share a property_id, across every key in the registry."""
+    ids = pd.Series(registry, dtype=object)
+    clashes = ids[ids.duplicated(keep=False)]
+    return (
+        pd.DataFrame({'property_id': clashes.values, 'property_key': clashes.index})
+        .sort_values(['property_id', 'property_key'])
+        .reset_index(drop=True)
+    )
+
+def clean_and_finalize_dataframe(df, id_registry=None):
+    """
+    Clean a snapshot (clean_data output) and assign property_id. Pass a registry
+    from load_id_registry() to reuse IDs across runs; colliding IDs are kept,
+    not deduplicated, so check find_id_collisions() afterwards.
+    """
+    if id_registry is None:
+        id_registry = {}
+    rows_in = len(df)
+    with METRICS.stage('clean'):
+        # Standardize text fields
+        for col in ['Address', 'Unit']:
+            if col in df.columns:
+                df[col] = smart_address_title_column(df[col])
+        # Clean numeric fields
+        if 'Price' in df.columns:
+            df['Price'] = pd.to_numeric(df['Price'], errors='coerce')
+        if 'SqFt' in df.columns:
+            df['SqFt'] = parse_sqft(df['SqFt'])
+        if 'Beds' in df.columns:
+            df['Beds'] = pd.to_numeric(df['Beds'], errors='coerce')
+        if 'Baths' in df.columns:
+            df['Baths'] = pd.to_numeric(df['Baths'], errors='coerce')
+        # Extract ZipCode
+        df['ZipCode'] = df['Address'].str.extract(r'(\d{5})(?!.*\d{5})')
+        # Extract City and State ONLY if needed
+        if not ('City' in df.columns and 'State' in df.columns):
+            df[['City', 'State']] = extract_city_state_columns(df['Address'])
+        else:
+            # If both exist but City is all NaN or empty, extract
+            if df['City'].isnull().all() or df['City'].eq('').all():
+                df[['City', 'State']] = extract_city_state_columns(df['Address'])
+        # Calculate price per sqft
+        df['PricePerSqFt'] = price_per_sqft(df['Price'], df['SqFt'])
+        # Beds_Baths combined field
+        df['Beds_Baths'] = beds_baths_label(df['Beds'], df['Baths'])
+    with METRICS.stage('ids'):
+        # Deterministic property_id
+        property_key = property_keys(df)
+        df['property_id'] = generate_property_ids(property_key, id_registry)
+        # Move property_id to first column
+        cols = ['property_id'] + [col for col in df.columns if col != 'property_id']
+        df = df[cols]
+        # Remove duplicate units (same property key); distinct keys sharing an ID are kept
+        df = df[~property_key.duplicated(keep='first').values].reset_index(drop=True)
+    METRICS.inc('units_cleaned', len(df))
+    METRICS.inc('duplicate_units', rows_in - len(df))
+    return df
+
+def clean_and_finalize_chunks(chunks, id_registry=None):
+    """
+    Lazily clean an iterable of raw DataFrames, e.g. pd.read_csv(path, chunksize=50000)
+    or scraper.ScrapeStream.read_chunks(). Duplicate units are dropped across
+    chunks as clean_and_finalize_dataframe does within one frame; only the
+    property keys seen so far are held in memory.
+    """
+    if id_registry is None:
+        id_registry = {}
+    seen = set()
+    for chunk in chunks:
+        chunk = clean_and_finalize_dataframe(chunk, id_registry)
+        keys = property_keys(chunk)
+        fresh = ~keys.isin(seen).values
+        seen.update(keys[fresh])
+        chunk = chunk[fresh].reset_index(drop=True)
+        if not chunk.empty:
+            yield chunk
+
+def add_month_year_columns(df, month_name, year_str):
+    df = df.copy()
+    df['month'] = MONTH_MAP[month_name]
+    df['year'] = int(year_str)
+    return df
+
+def finalize_for_db(df, month_name, year_str):
+    """Add month/year, rename to the database column names and put columns in table order."""
+    df = add_month_year_columns(df, month_name, year_str)
+    df = df.rename(columns=COLUMN_MAPPING)
+    # Only keep columns that exist in the DataFrame (handles older CSVs)
+    return df[[col for col in FINAL_COLS if col in df.columns]]
+
+def output_name(month_name, year_str):
+    return f"SD_county_{month_name}_{year_str}.csv"
@@ -0,0 +1,106 @@
+"""
+File and month pickers for the interactive scripts. tkinter is imported on
+first use; where it is missing or there is no display (a headless server),
+each picker asks on the console instead.
+"""
+import calendar
+import os
+from datetime import datetime
+
+
+def _tk_root():
+    """A hidden Tk root window, or None when Tk cannot start here."""
+    try:
+        import tkinter as tk
+    except ImportError as e:
+        print(f"No GUI available ({e}); asking on the console.")
+        return None
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:  # e.g. no $DISPLAY
+        print(f"No GUI available ({e}); asking on the console.")
+        return None
+    root.withdraw()
+    return root
+
+def _ask(prompt, default=''):
+    try:
+        answer = input(f"{prompt} [{default}]: " if default else f"{prompt}: ").strip()
+    except EOFError:
+        return default
+    return answer or default
+
+def ask_month_year():
+    """(month name, year) for the data, defaulting to the current month."""
+    from rental_core.cleaning import MONTHS, YEARS
+    current_month = calendar.month_name[datetime.now().month]
+    current_year = str(datetime.now().year)
+    root = _tk_root()
+    if root is None:
+        month = _ask(f"Month ({MONTHS[0]}..{MONTHS[-1]})", current_month).capitalize()
+        year = _ask("Year", current_year)
+        if month not in MONTHS or year not in YEARS:
+            print(f"Unknown month/year {month} {year}; using {current_month} {current_year}.")
+            return current_month, current_year
+        return month, year
+
+    import tkinter as tk
+    from tkinter import ttk
+    dialog = tk.Toplevel()
+    dialog.title("Select Month and Year")
+    dialog.grab_set()
+    tk.Label(dialog, text="Month:").grid(row=0, column=0, padx=5, pady=5)
+    tk.Label(dialog, text="Year:").grid(row=1, column=0, padx=5, pady=5)
+    month_var = tk.StringVar(value=current_month)
+    year_var = tk.StringVar(value=current_year)
+    month_cb = ttk.Combobox(dialog, textvariable=month_var, values=MONTHS, state="readonly")
+    year_cb = ttk.Combobox(dialog, textvariable=year_var, values=YEARS, state="readonly")
+    month_cb.grid(row=0, column=1, padx=5, pady=5)
+    year_cb.grid(row=1, column=1, padx=5, pady=5)
+
+    def on_ok():
+        dialog.result = (month_cb.get(), year_cb.get())
+        dialog.destroy()
+    ok_btn = tk.Button(dialog, text="OK", command=on_ok)
+    ok_btn.grid(row=2, column=0, columnspan=2, pady=10)
+    dialog.wait_window()
+    root.destroy()
+    return getattr(dialog, 'result', (current_month, current_year))
+
+def ask_open_file(title):
+    """One CSV path to read, or '' if cancelled."""
+    root = _tk_root()
+    if root is None:
+        return _ask(f"{title} (path)")
+    from tkinter import filedialog
+    path = filedialog.askopenfilename(title=title, filetypes=[("CSV files", "*.csv")])
+    root.destroy()
+    return path
+
+def ask_open_files(title):
+    """CSV paths to read (empty if cancelled); on the console, space-separated."""
+    root = _tk_root()
+    if root is None:
+        return _ask(f"{title} (paths)").split()
+    from tkinter import filedialog
+    paths = filedialog.askopenfilenames(
+        title=title,
+        filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+    )
+    root.destroy()
+    return list(paths)
+
+def ask_save_file(title, initialfile):
+    """Path to write a CSV to, or '' if cancelled."""
+    root = _tk_root()
+    if root is None:
+        return _ask(f"{title} (path)", os.path.join(os.getcwd(), initialfile))
+    from tkinter import filedialog
+    path = filedialog.asksaveasfilename(
+        title=title,
+        defaultextension=".csv",
+        initialfile=initialfile,
+        filetypes=[("CSV files", "*.csv")]
+    )
+    root.destroy()
+    return path
@@ -1,203 +1,164 @@
 import pandas as pd
-import tkinter as tk
-from tkinter import ttk, filedialog
 import os
-import hashlib
 import re
 import calendar
-import numpy as np
-from datetime import datetime
+import argparse
+import glob
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pipeline_metrics import METRICS
+from rental_core import (
+    ID_REGISTRY_PATH, MONTH_MAP, clean_and_finalize_dataframe, finalize_for_db, find_id_collisions,
+    load_id_registry, output_name, save_id_registry,
+)
+from rental_core.dialogs import ask_month_year, ask_open_file, ask_save_file
 
 # Constants
-MONTH_MAP = {
-    'January': 1, 'February': 2, 'March': 3, 'April': 4,
-    'May': 5, 'June': 6, 'July': 7, 'August': 8,
-    'September': 9, 'October': 10, 'November': 11, 'December': 12
-}
-MONTHS = list(MONTH_MAP.keys())
-YEARS = [str(y) for y in range(2020, 2031)]
+SNAPSHOT_GLOB = "san_diego_county_rentals_*.csv"
+SNAPSHOT_DATE = re.compile(r'san_diego_county_rentals_(\d{4})-(\d{2})-(\d{2})\.csv$')
+MONTH_ROLLOVER_DAY = 16  # snapshots taken on/after this day count towards the next month
+METRICS_RUN = "processor"  # per-run metrics go to metrics/processor_<timestamp>.json
 
-def smart_address_title(s):
-    """Standardize address/unit formatting."""
-    if pd.isnull(s):
-        return s
-    s = str(s).strip().title()
-    s = re.sub(r'(\d+)(St|Nd|Rd|Th)\b', lambda m: m.group(1) + m.group(2).lower(), s)
-    return s
-
-def deterministic_12_digit(s):
-    """Generate deterministic 12-digit property_id."""
-    h = int(hashlib.sha256(s.encode()).hexdigest(), 16)
-    return str(h)[-12:]
-
-def extract_city_state(address):
-    """
-    Extract City and State robustly from US-style addresses.
-    Handles:
-      - "123 Main St, San Diego, CA 92101"
-      - "123 Main St, CA 92101"
-      - "123 Main St, 92101"
-      - and missing values gracefully.
-    """
-    if pd.isnull(address):
-        return pd.Series([np.nan, np.nan])
-    # Try full match with city and state
-    m = re.search(r',\s*([^,]+),\s*([A-Z]{2})\s*\d{5}', address)
-    if m:
-        return pd.Series([m.group(1).strip(), m.group(2).strip()])
-    # Try just state and zip
-    m2 = re.search(r',\s*([A-Z]{2})\s*\d{5}', address)
-    if m2:
-        return pd.Series([np.nan, m2.group(1).strip()])
-    # Only zip at end, nothing else
-    m3 = re.search(r',\s*(\d{5})$', address)
-    if m3:
-        return pd.Series([np.nan, np.nan])
-    return pd.Series([np.nan, np.nan])
-
-def clean_and_finalize_dataframe(df):
-    # Standardize text fields
-    for col in ['Address', 'Unit']:
-        if col in df.columns:
-            df[col] = df[col].apply(smart_address_title)
-    # Clean numeric fields
-    if 'Price' in df.columns:
-        df['Price'] = pd.to_numeric(df['Price'], errors='coerce')
-    if 'SqFt' in df.columns:
-        df['SqFt'] = pd.to_numeric(df['SqFt'].astype(str).str.replace(',', '').str.extract(r'(\d+)', expand=False), errors='coerce')
-    if 'Beds' in df.columns:
-        df['Beds'] = pd.to_numeric(df['Beds'], errors='coerce')
-    if 'Baths' in df.columns:
-        df['Baths'] = pd.to_numeric(df['Baths'], errors='coerce')
-    # Extract ZipCode
-    df['ZipCode'] = df['Address'].str.extract(r'(\d{5})(?!.*\d{5})')
-    # Extract City and State ONLY if needed
-    if not ('City' in df.columns and 'State' in df.columns):
-        df[['City', 'State']] = df['Address'].apply(extract_city_state)
-    else:
-        # If both exist but City is all NaN or empty, extract
-        if df['City'].isnull().all() or df['City'].eq('').all():
-            df[['City', 'State']] = df['Address'].apply(extract_city_state)
-    # Calculate price per sqft
-    df['PricePerSqFt'] = df.apply(
-        lambda row: round(row['Price'] / row['SqFt'], 2) if pd.notnull(row['Price']) and pd.notnull(row['SqFt']) and row['SqFt'] > 0 else None,
-        axis=1
-    )
-    # Beds_Baths combined field
-    df['Beds_Baths'] = df.apply(
-        lambda row: f"{int(row['Beds']) if pd.notnull(row['Beds']) else 'N/A'} Bed / {int(row['Baths']) if pd.notnull(row['Baths']) else 'N/A'} Bath",
-        axis=1
-    )
-    # Deterministic property_id
-    property_key = df['Address'].fillna('') + '|' + df['Unit'].fillna('') + '|' + df['SqFt'].fillna('').astype(str)
-    df['property_id'] = property_key.apply(deterministic_12_digit)
-    # Move property_id to first column
-    cols = ['property_id'] + [col for col in df.columns if col != 'property_id']
-    df = df[cols]
-    # Remove duplicates on property_id
-    df = df.drop_duplicates(subset='property_id', keep='first').reset_index(drop=True)
-    return df
-
-def ask_month_year():
-    root = tk.Tk()
-    root.withdraw()
-    dialog = tk.Toplevel()
-    dialog.title("Select Month and Year")
-    dialog.grab_set()
-    tk.Label(dialog, text="Month:").grid(row=0, column=0, padx=5, pady=5)
-    tk.Label(dialog, text="Year:").grid(row=1, column=0, padx=5, pady=5)
-    current_month = calendar.month_name[datetime.now().month]
-    current_year = str(datetime.now().year)
-    month_var = tk.StringVar(value=current_month)
-    year_var = tk.StringVar(value=current_year)
-    month_cb = ttk.Combobox(dialog, textvariable=month_var, values=MONTHS, state="readonly")
-    year_cb = ttk.Combobox(dialog, textvariable=year_var, values=YEARS, state="readonly")
-    month_cb.grid(row=0, column=1, padx=5, pady=5)
-    year_cb.grid(row=1, column=1, padx=5, pady=5)
-    def on_ok():
-        dialog.result = (month_cb.get(), year_cb.get())
-        dialog.destroy()
-    ok_btn = tk.Button(dialog, text="OK", command=on_ok)
-    ok_btn.grid(row=2, column=0, columnspan=2, pady=10)
-    dialog.wait_window()
-    root.destroy()
-    return getattr(dialog, 'result', (current_month, current_year))
-
-def add_month_year_columns(df, month_name, year_str):
-    df = df.copy()
-    df['month'] = MONTH_MAP[month_name]
-    df['year'] = int(year_str)
-    return df
 
 def save_dataframe(df, month_name, year_str):
-    save_path = filedialog.asksaveasfilename(
-        title="Save processed CSV for DB import",
-        defaultextension=".csv",
-        initialfile=f"SD_county_{month_name}_{year_str}.csv",
-        filetypes=[("CSV files", "*.csv")]
-    )
+    save_path = ask_save_file("Save processed CSV for DB import", output_name(month_name, year_str))
     if save_path:
-        df.to_csv(save_path, index=False)
+        with METRICS.stage('save'):
+            df.to_csv(save_path, index=False)
         print(f"\nSaved ready-to-import CSV to: {os.path.basename(save_path)}\n")
     else:
         print("Save cancelled.")
 
 def main():
-    root = tk.Tk()
-    root.withdraw()
-    csv_path = filedialog.askopenfilename(
-        title="Select original rental CSV file",
-        filetypes=[("CSV files", "*.csv")]
-    )
+    csv_path = ask_open_file("Select original rental CSV file")
     if not csv_path:
         print("No file selected. Exiting.")
         return
-    df = pd.read_csv(csv_path)
-    df = clean_and_finalize_dataframe(df)
+    with METRICS.stage('read'):
+        df = pd.read_csv(csv_path)
+    id_registry = load_id_registry()
+    df = clean_and_finalize_dataframe(df, id_registry)
+    collisions = find_id_collisions(id_registry)
+    if not collisions.empty:
+        print(f"WARNING: {collisions['property_id'].nunique()} property_id collisions between distinct properties:")
+        print(collisions.head(20))
+    save_id_registry(id_registry)
     selected_month, selected_year = ask_month_year()
-    df = add_month_year_columns(df, selected_month, selected_year)
-    
-    # Rename columns to match database schema (lowercase)
-    column_mapping = {
-        'Property': 'property',
-        'Address': 'address', 
-        'City': 'city',
-        'State': 'state',
-        'ZipCode': 'zipcode',
-        'Phone': 'phone',
-        'Unit': 'unit',
-        'Beds': 'beds',
-        'Baths': 'baths',
-        'Beds_Baths': 'beds_baths',
-        'SqFt': 'sqft',
-        'Price': 'price',
-        'PricePerSqFt': 'pricepersqft',
-        'RentalType': 'rentaltype',
-        'HasWasherDryer': 'haswasherdryer',
-        'HasAirConditioning': 'hasairconditioning',
-        'HasPool': 'haspool',
-        'HasSpa': 'hasspa',
-        'HasGym': 'hasgym',
-        'HasEVCharging': 'hasevcharging',
-        'IsPetFriendly': 'ispetfriendly',
-        'ListingURL': 'listingurl'
-    }
-    df = df.rename(columns=column_mapping)
-    
-    # Final column order to match database schema
-    final_cols = [
-        'property_id', 'property', 'address', 'city', 'state', 'zipcode', 'phone', 'unit',
-        'beds', 'baths', 'beds_baths', 'sqft', 'price', 'pricepersqft',
-        'rentaltype', 'haswasherdryer', 'hasairconditioning', 'haspool', 'hasspa',
-        'hasgym', 'hasevcharging', 'ispetfriendly', 'listingurl', 'month', 'year'
-    ]
-    # Only keep columns that exist in the DataFrame (handles older CSVs)
-    df = df[[col for col in final_cols if col in df.columns]]
+    df = finalize_for_db(df, selected_month, selected_year)
     # Debug: print addresses missing city/state
     if df['city'].isnull().any() or df['state'].isnull().any():
         print("Some addresses are missing City or State. First few examples:")
         print(df[df['city'].isnull() | df['state'].isnull()][['address', 'city', 'state']].head(10))
     save_dataframe(df, selected_month, selected_year)
+    print(f"Run metrics written to {METRICS.write_json(METRICS_RUN)}")
+
+def snapshot_month_year(path):
+    """
+    (month name, year) a raw snapshot is for, from its san_diego_county_rentals_YYYY-MM-DD.csv
+    name. Scrapes from late in a month count towards the next one
+    (2025-04-30 -> May 2025, 2025-07-01 -> July 2025). None if the name does not match.
+    """
+    match = SNAPSHOT_DATE.search(os.path.basename(path))
+    if not match:
+        return None
+    snapshot = date(*map(int, match.groups()))
+    year, month = snapshot.year, snapshot.month
+    if snapshot.day >= MONTH_ROLLOVER_DAY:
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return calendar.month_name[month], str(year)
+
+def find_snapshots(sources):
+    """Expand directories and globs into raw snapshot paths, sorted by name (= scrape date)."""
+    paths = set()
+    for source in sources:
+        if os.path.isdir(source):
+            paths.update(glob.glob(os.path.join(source, SNAPSHOT_GLOB)))
+        else:
+            paths.update(glob.glob(source))
+    return sorted(paths, key=os.path.basename)
+
+def process_snapshot(csv_path, month_name, year_str, out_dir, id_registry, store_dir=None):
+    """
+    Batch worker: clean one raw snapshot and write its DB-ready CSV, and its
+    snapshot store partition when store_dir is given. Runs in a separate
+    process, so it returns the registry entries it added and its metrics for
+    the parent to merge.
+    """
+    METRICS.reset()  # pool processes are reused; report this snapshot only
+    known = set(id_registry)
+    with METRICS.stage('read'):
+        raw = pd.read_csv(csv_path)
+    df = clean_and_finalize_dataframe(raw, id_registry)
+    df = finalize_for_db(df, month_name, year_str)
+    out_path = os.path.join(out_dir, output_name(month_name, year_str))
+    with METRICS.stage('save'):
+        df.to_csv(out_path, index=False)
+    if store_dir:
+        from snapshot_store import SnapshotStore  # needs pyarrow
+        with METRICS.stage('store'):
+            SnapshotStore(store_dir).write_month(df, year_str, MONTH_MAP[month_name])
+    missing_city = int((df['city'].isnull() | df['state'].isnull()).sum())
+    METRICS.inc('snapshots')
+    METRICS.inc('missing_city_state', missing_city)
+    new_ids = {key: pid for key, pid in id_registry.items() if key not in known}
+    return out_path, len(df), missing_city, new_ids, METRICS.snapshot()
+
+def run_batch(sources, out_dir=".", workers=None, registry_path=ID_REGISTRY_PATH, store_dir=None):
+    """
+    Process every raw snapshot matched by `sources` in a process pool, one
+    output per month. When several snapshots fall in the same month the
+    latest one is used.
+    """
+    by_month = {}
+    for path in find_snapshots(sources):
+        month_year = snapshot_month_year(path)
+        if month_year is None:
+            print(f"Skipping {os.path.basename(path)}: no snapshot date in the file name")
+            continue
+        if month_year in by_month:
+            print(f"Skipping {os.path.basename(by_month[month_year])}: "
+                  f"{os.path.basename(path)} is a later snapshot for {' '.join(month_year)}")
+        by_month[month_year] = path
+    if not by_month:
+        print("No snapshot files found.")
+        return []
+
+    os.makedirs(out_dir, exist_ok=True)
+    id_registry = load_id_registry(registry_path)
+    outputs = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(process_snapshot, path, month, year, out_dir, id_registry, store_dir): path
+            for (month, year), path in by_month.items()
+        }
+        for future, path in futures.items():
+            out_path, rows, missing_city, new_ids, metrics = future.result()
+            id_registry.update(new_ids)
+            METRICS.merge(metrics)
+            outputs.append(out_path)
+            note = f" ({missing_city} missing city/state)" if missing_city else ""
+            print(f"{os.path.basename(path)} -> {os.path.basename(out_path)}: {rows} rows{note}")
+
+    collisions = find_id_collisions(id_registry)
+    if not collisions.empty:
+        print(f"WARNING: {collisions['property_id'].nunique()} property_id collisions between distinct properties:")
+        print(collisions.head(20))
+    save_id_registry(id_registry, registry_path)
+    print(f"Run metrics written to {METRICS.write_json(METRICS_RUN + '_batch')}")
+    return outputs
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Clean raw rental CSVs for database import.")
+    parser.add_argument("--batch", nargs="+", metavar="PATH",
+                        help="process raw snapshots (directories or globs) without dialogs; "
+                             "month/year come from the file names")
+    parser.add_argument("--out-dir", default=".", help="where batch outputs are written")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for --batch (default: all cores)")
+    parser.add_argument("--store", metavar="DIR",
+                        help="also write each month to this Parquet snapshot store (see snapshot_store.py)")
+    args = parser.parse_args()
+    if args.batch:
+        run_batch(args.batch, args.out_dir, args.workers, store_dir=args.store)
+    else:
+        main()
\ No newline at end of file
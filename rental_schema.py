@@ -0,0 +1,169 @@
+"""
+Canonical column layout and compact dtypes for processed rental data
+(the DB-ready SD_county_<Month>_<Year>.csv files).
+
+    python rental_schema.py SD_county_*.csv      # load and report memory
+"""
+import argparse
+import glob
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Rename columns to match database schema (lowercase)
+COLUMN_MAPPING = {
+    'Property': 'property',
+    'Address': 'address',
+    'City': 'city',
+    'State': 'state',
+    'ZipCode': 'zipcode',
+    'Phone': 'phone',
+    'Unit': 'unit',
+    'Beds': 'beds',
+    'Baths': 'baths',
+    'Beds_Baths': 'beds_baths',
+    'SqFt': 'sqft',
+    'Price': 'price',
+    'PricePerSqFt': 'pricepersqft',
+    'RentalType': 'rentaltype',
+    'HasWasherDryer': 'haswasherdryer',
+    'HasAirConditioning': 'hasairconditioning',
+    'HasPool': 'haspool',
+    'HasSpa': 'hasspa',
+    'HasGym': 'hasgym',
+    'HasEVCharging': 'hasevcharging',
+    'IsPetFriendly': 'ispetfriendly',
+    'ListingURL': 'listingurl'
+}
+# Final column order to match database schema
+FINAL_COLS = [
+    'property_id', 'property', 'address', 'city', 'state', 'zipcode', 'phone', 'unit',
+    'beds', 'baths', 'beds_baths', 'sqft', 'price', 'pricepersqft',
+    'rentaltype', 'haswasherdryer', 'hasairconditioning', 'haspool', 'hasspa',
+    'hasgym', 'hasevcharging', 'ispetfriendly', 'listingurl', 'month', 'year'
+]
+# Text repeats across units and months, so every text column is a categorical.
+# property_id is the 12-digit hash as a number; format_property_id() restores the zero padding.
+FINAL_DTYPES = {
+    'property_id': 'uint64',
+    'property': 'category',
+    'address': 'category',
+    'city': 'category',
+    'state': 'category',
+    'zipcode': 'category',
+    'phone': 'category',
+    'unit': 'category',
+    'beds': 'Int8',
+    'baths': 'Float32',
+    'beds_baths': 'category',
+    'sqft': 'Int32',
+    'price': 'float64',
+    'pricepersqft': 'float64',
+    'rentaltype': 'category',
+    'haswasherdryer': 'boolean',
+    'hasairconditioning': 'boolean',
+    'haspool': 'boolean',
+    'hasspa': 'boolean',
+    'hasgym': 'boolean',
+    'hasevcharging': 'boolean',
+    'ispetfriendly': 'boolean',
+    'listingurl': 'category',
+    'month': 'uint8',
+    'year': 'uint16',
+}
+MISSING_TEXT = ['', 'nan', 'N/A', '<NA>']
+
+
+def text_column(col):
+    """Text as pandas strings; IDs, zips and phones read as numbers lose their '.0'."""
+    if pd.api.types.is_float_dtype(col):
+        col = col.astype('Int64')
+    col = col.astype('string')
+    return col.mask(col.isin(MISSING_TEXT))
+
+
+def format_property_id(col):
+    """uint64 property_id back to the 12-digit zero-padded string."""
+    return col.map('{:012d}'.format)
+
+
+def memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def apply_schema(df):
+    """Rename to database column names and convert every known column to FINAL_DTYPES."""
+    df = df.rename(columns=COLUMN_MAPPING)
+    out = {}
+    for name in dict.fromkeys(df.columns):
+        col = df[name]
+        if isinstance(col, pd.DataFrame):
+            # Both spellings present (e.g. 'Beds' and 'beds'): first non-null value wins
+            first = col.iloc[:, 0]
+            for i in range(1, col.shape[1]):
+                first = first.where(first.notna(), col.iloc[:, i])
+            col = first
+        dtype = FINAL_DTYPES.get(name)
+        if dtype is None:
+            out[name] = col
+        elif dtype == 'category':
+            out[name] = text_column(col).astype('category')
+        elif dtype == 'boolean':
+            out[name] = col.map({True: True, False: False, 'True': True, 'False': False}).astype('boolean')
+        elif dtype == 'uint64':
+            out[name] = pd.to_numeric(col).astype('uint64')
+        else:
+            col = pd.to_numeric(col, errors='coerce')
+            if 'int' in dtype.lower():
+                col = col.round()
+            out[name] = col.astype(dtype)
+    return pd.DataFrame(out, index=df.index)
+
+
+def concat_compact(frames):
+    """pd.concat that keeps categoricals categorical by unifying their categories first."""
+    frames = list(frames)
+    if not frames:
+        return pd.DataFrame(columns=FINAL_COLS)
+    categorical = [
+        name for name in frames[0].columns
+        if all(name in f.columns and isinstance(f[name].dtype, pd.CategoricalDtype) for f in frames)
+    ]
+    for name in categorical:
+        categories = union_categoricals([f[name] for f in frames]).categories
+        for f in frames:
+            f[name] = f[name].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_rentals(paths, report=True):
+    """
+    Read processed rental CSVs (paths or globs) into one compact DataFrame.
+    Each file is converted as it is read, so only one file is ever held in
+    default dtypes. With report=True prints memory with default read_csv
+    dtypes versus after the schema.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    files = [path for pattern in paths for path in sorted(glob.glob(pattern))]
+    before = 0.0
+    frames = []
+    for path in files:
+        raw = pd.read_csv(path)
+        before += memory_mb(raw)
+        frames.append(apply_schema(raw))
+    df = concat_compact(frames)
+    if report:
+        after = memory_mb(df)
+        print(
+            f"Loaded {len(df)} rows from {len(files)} files: "
+            f"{before:.1f} MB as read_csv -> {after:.1f} MB compact "
+            f"({after / before:.0%})" if before else f"No files matched {paths}"
+        )
+    return df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load processed rental CSVs with the compact schema.")
+    parser.add_argument('paths', nargs='+')
+    load_rentals(parser.parse_args().paths)
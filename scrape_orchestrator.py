@@ -0,0 +1,366 @@
+"""
+Asyncio orchestrator for scraper.py: rate-limited, bounded-concurrency
+fetching with retries, and parsing in a process pool so network waits and
+BeautifulSoup work overlap.
+
+    python scraper.py --async                 # same CSV as scraper.py, different engine
+    python scraper.py --async --replay        # rebuild from the page cache, parsing in parallel
+
+Index pages are walked in order while detail pages of earlier pages are
+still in flight; a bounded queue of placards applies backpressure to the
+walk. Units come out in the same order as scraper.scrape_listings. Failed
+fetches are retried with backoff; over HTTP, a page still missing after
+MAX_RETRIES is rendered once in the browser. Fetches that fail even so, and
+pages that cannot be parsed, are collected as FailedURL records and written
+to failed_urls_<date>.csv.
+"""
+import asyncio
+import csv
+import logging
+import multiprocessing
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+import scraper
+from pipeline_metrics import METRICS
+
+CONCURRENCY = 8  # detail pages fetched at once (one thread and one lazy browser each)
+PARSE_WORKERS = 4  # processes parsing HTML
+QUEUE_PAGES = 2  # index pages of placards allowed to wait for a fetch slot
+GLOBAL_RATE = 8.0  # requests per second across all hosts
+GLOBAL_BURST = 8
+HOST_RATE = 4.0  # requests per second to any one host
+HOST_BURST = 4
+MAX_RETRIES = 3  # retries after the first attempt
+BACKOFF_BASE = 1.0  # seconds; attempt n waits up to BACKOFF_BASE * 2**n (full jitter)
+BACKOFF_MAX = 30.0
+FAILED_REPORT = "failed_urls_{date}.csv"
+
+FailedURL = namedtuple('FailedURL', ['url', 'kind', 'attempts', 'reason'])
+
+
+class IncompletePage(Exception):
+    """A page came back without the markup we parse (truncated, JS-gated or a bot check); see scraper.page_complete."""
+
+
+class RateLimiter:
+    """Token bucket: `rate` acquisitions per second on average, bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostRateLimiter:
+    """A global bucket plus one bucket per host; acquire(url) waits for both."""
+
+    def __init__(self, rate=GLOBAL_RATE, burst=GLOBAL_BURST, host_rate=HOST_RATE, host_burst=HOST_BURST):
+        self.limiter = RateLimiter(rate, burst)
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+        self.hosts = {}
+
+    async def acquire(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = RateLimiter(self.host_rate, self.host_burst)
+        await self.hosts[host].acquire()
+        await self.limiter.acquire()
+
+
+def describe(error):
+    return f"{type(error).__name__}: {error}".strip()
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class Orchestrator:
+    """
+    One run's fetch/parse machinery. fetch() and parse() are safe to call from
+    many coroutines at once; every network fetch passes the rate limiter and
+    holds one of CONCURRENCY driver slots.
+    """
+
+    def __init__(self, http=None, cache=None, concurrency=CONCURRENCY, parse_workers=PARSE_WORKERS,
+                 limiter=None):
+        self.http = http
+        self.cache = cache
+        self.concurrency = concurrency
+        self.limiter = limiter or HostRateLimiter()
+        self.fetch_pool = ThreadPoolExecutor(max_workers=concurrency)
+        # spawn, not fork: the fetch threads may be mid-request when the pool starts
+        self.parse_pool = ProcessPoolExecutor(
+            max_workers=parse_workers, mp_context=multiprocessing.get_context('spawn')
+        ) if parse_workers > 0 else None
+        self.drivers = asyncio.Queue()
+        self.all_drivers = [scraper.LazyDriver() for _ in range(concurrency)]
+        for driver in self.all_drivers:
+            self.drivers.put_nowait(driver)
+        self.failures = []
+
+    def close(self):
+        self.fetch_pool.shutdown(wait=True)
+        if self.parse_pool:
+            self.parse_pool.shutdown(wait=True)
+        for driver in self.all_drivers:
+            driver.quit()
+
+    def _fetch_once(self, driver, url, kind):
+        if self.http is None:
+            return self._fetch_browser(driver, url, kind)
+        html = self.http.fetch(url, kind)  # raises on a failed request, to be retried
+        if html is None:
+            raise IncompletePage(f"HTTP page incomplete ({kind})")
+        METRICS.inc('pages', kind=kind, source='http')
+        return html
+
+    def _fetch_browser(self, driver, url, kind):
+        html = scraper.browser_fetch(driver, url, kind)
+        if not scraper.page_complete(html, kind):
+            raise IncompletePage(f"browser page incomplete ({kind})")
+        return html
+
+    async def _attempt(self, fetch, url, kind, attempt):
+        """One network request under a rate-limit token and a driver slot: (html, None) or (None, error)."""
+        await self.limiter.acquire(url)
+        driver = await self.drivers.get()
+        try:
+            html = await asyncio.get_running_loop().run_in_executor(self.fetch_pool, fetch, driver, url, kind)
+        except Exception as e:
+            logging.info(f"Attempt {attempt} failed for {url}: {describe(e)}")
+            return None, e
+        finally:
+            self.drivers.put_nowait(driver)
+        return html, None
+
+    async def fetch(self, url, kind):
+        """
+        Page HTML, or None after recording a FailedURL. Cache hits skip the
+        rate limiter. With an HttpFetcher failed requests are retried with
+        backoff, and the browser renders the page once, straight away when
+        it came back incomplete (JS-gated, bot check) or after the retries.
+        """
+        loop = asyncio.get_running_loop()
+        if self.cache is not None:
+            html = await loop.run_in_executor(self.fetch_pool, self.cache.get, url)
+            if html is not None:
+                METRICS.inc('pages', kind=kind, source='cache')
+                return html
+            if self.cache.replay:
+                self.fail(url, kind, 0, "not in page cache")
+                return None
+
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt:
+                METRICS.inc('retries', kind=kind)
+                await asyncio.sleep(backoff_delay(attempt))
+            html, error = await self._attempt(self._fetch_once, url, kind, attempt + 1)
+            if html is not None or (self.http is not None and isinstance(error, IncompletePage)):
+                break
+        attempts = attempt + 1
+        if html is None and self.http is not None:
+            logging.debug(f"Falling back to browser for {url}")
+            attempts += 1
+            html, error = await self._attempt(self._fetch_browser, url, kind, attempts)
+        if html is None:
+            self.fail(url, kind, attempts, describe(error))
+            return None
+        if self.cache is not None and scraper.page_complete(html, kind):
+            await loop.run_in_executor(self.fetch_pool, self.cache.put, url, html)
+        return html
+
+    async def parse(self, func, *args):
+        if self.parse_pool is None:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.parse_pool, func, *args)
+
+    def fail(self, url, kind, attempts, reason):
+        METRICS.inc('errors', stage='fetch' if attempts else 'replay')
+        logging.warning(f"Giving up on {url} after {attempts} attempts: {reason}")
+        self.failures.append(FailedURL(url, kind, attempts, reason))
+
+    async def scrape_property(self, placard):
+        url = placard['ListingURL']
+        html = await self.fetch(url, 'detail')
+        if html is None:
+            return []
+        start = time.perf_counter()
+        try:
+            units = await self.parse(scraper.parse_property_page, html, placard)
+        except Exception as e:
+            METRICS.inc('errors', stage='parse')
+            self.failures.append(FailedURL(url, 'detail', 1, f"parse: {type(e).__name__}: {e}"))
+            return []
+        METRICS.observe('parse_seconds', time.perf_counter() - start, kind='detail')
+        METRICS.inc('properties')
+        METRICS.inc('units', len(units))
+        return units
+
+    async def scrape_listings(self, previous=None, stream=None, base_url=None, max_pages=None):
+        """
+        Walk the index pages of base_url (default scraper.BASE_URL) and scrape
+        every detail page; the async counterpart of scraper.scrape_listings
+        (PreviousSnapshot and ScrapeStream work the same way). Returns the
+        units DataFrame, or None when streaming. Several searches may run at
+        once and share the fetch slots and rate limits. max_pages stops the
+        walk there, for callers that split a capped search.
+        """
+        placards = asyncio.Queue(maxsize=QUEUE_PAGES * scraper.LISTINGS_PER_PAGE)
+        pages = asyncio.Queue()
+        workers = [asyncio.create_task(self._detail_worker(placards)) for _ in range(self.concurrency)]
+        collector = asyncio.create_task(self._collect(pages, stream))
+        try:
+            await self._walk_index(placards, pages, previous, stream, base_url or scraper.BASE_URL, max_pages)
+            await pages.put(None)
+            return await collector
+        finally:
+            for task in workers:
+                task.cancel()
+            collector.cancel()
+            await asyncio.gather(*workers, collector, return_exceptions=True)
+
+    async def _detail_worker(self, placards):
+        while True:
+            placard, future = await placards.get()
+            try:
+                future.set_result(await self.scrape_property(placard))
+            except Exception as e:  # never leave the collector waiting
+                future.set_exception(e)
+
+    async def _walk_index(self, placards, pages, previous, stream, base_url, max_pages):
+        loop = asyncio.get_running_loop()
+        page = stream.next_page if stream else 1
+        while True:
+            url = f"{base_url}{page}/"
+            logging.info(f"Scraping page {page}: {url}")
+            html = await self.fetch(url, 'index')
+            if html is None:
+                break
+            start = time.perf_counter()
+            listing_count, page_placards = await self.parse(scraper.parse_index_page, html)
+            METRICS.observe('parse_seconds', time.perf_counter() - start, kind='index')
+            if not listing_count:
+                break
+
+            results = []
+            for placard in page_placards:
+                rows = previous.carry_forward(placard) if previous is not None else None
+                future = loop.create_future()
+                if rows is None:
+                    await placards.put((placard, future))  # blocks while the fetchers are behind
+                else:
+                    if rows:  # [] is a property another search shard already took
+                        METRICS.inc('properties_carried')
+                        METRICS.inc('units_carried', len(rows))
+                    future.set_result(rows)
+                results.append(future)
+            await pages.put((page, page_placards, results))
+
+            if listing_count < scraper.LISTINGS_PER_PAGE:
+                break
+            if max_pages and page >= max_pages:
+                logging.info(f"Stopped at page {max_pages}: {base_url}")
+                break
+            page += 1
+
+    async def _collect(self, pages, stream):
+        # Finish pages in order, so streamed parts and the returned rows match the serial scraper
+        all_units = []
+        while True:
+            item = await pages.get()
+            if item is None:
+                break
+            page, page_placards, results = item
+            page_units = [unit for units in await asyncio.gather(*results) for unit in units]
+            if stream:
+                stream.write_page(page, page_units, page_placards[-1]['ListingURL'] if page_placards else None)
+            else:
+                all_units.extend(page_units)
+        return None if stream else pd.DataFrame(all_units)
+
+
+def scrape_listings_async(http=None, cache=None, previous=None, stream=None,
+                          concurrency=CONCURRENCY, parse_workers=PARSE_WORKERS, base_url=None):
+    """Run the orchestrator to completion; returns (units DataFrame or None, [FailedURL])."""
+    async def run():
+        orchestrator = Orchestrator(http, cache, concurrency, parse_workers)
+        try:
+            return await orchestrator.scrape_listings(previous, stream, base_url), orchestrator.failures
+        finally:
+            orchestrator.close()
+
+    return asyncio.run(run())
+
+
+class SearchRunner:
+    """
+    One Orchestrator on an event loop in a background thread, so blocking
+    callers (search_shards' worker threads) can run searches on it
+    concurrently: scrape(previous, base_url, max_pages) returns that search's
+    units.
+    """
+
+    def __init__(self, http=None, cache=None, concurrency=CONCURRENCY, parse_workers=PARSE_WORKERS):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.orchestrator = self._call(self._start(http, cache, concurrency, parse_workers))
+
+    async def _start(self, *args):
+        return Orchestrator(*args)
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def scrape(self, previous, base_url, max_pages=None):
+        return self._call(self.orchestrator.scrape_listings(previous, None, base_url, max_pages))
+
+    @property
+    def failures(self):
+        return self.orchestrator.failures
+
+    def close(self):
+        try:
+            self.orchestrator.close()
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+
+
+def report_failures(failures, path):
+    """Print a summary of failed URLs and write them to `path`; nothing is written if all succeeded."""
+    if not failures:
+        print("All pages fetched and parsed.")
+        return None
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(FailedURL._fields)
+        writer.writerows(failures)
+    print(f"{len(failures)} URLs failed; details in {path}")
+    for failure in failures[:10]:
+        print(f"  {failure.url} ({failure.kind}, {failure.attempts} attempts): {failure.reason}")
+    return path
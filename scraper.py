@@ -1,208 +1,731 @@
-
-from selenium import webdriver
-from selenium.webdriver.edge.service import Service
-from selenium.webdriver.edge.options import Options
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from amenity_rules import AMENITY_CLASSIFIER, amenity_text
+import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import time
 import os
+import argparse
+import glob
+import json
 import logging
 import re
+import queue
+import threading
 from datetime import datetime
-
-HEADLESS = True
-WAIT_TIME = 4
+from page_cache import PageCache, CACHE_DIR, CACHE_TTL_DAYS
+from pipeline_metrics import METRICS
+from rental_core import clean_data
+from rental_core.browser import AdaptiveWait, LazyDriver, init_driver
+
+try:
+    import lxml  # noqa: F401  (only needed as the BeautifulSoup tree builder)
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+PAGE_READY = {
+    'index': ['article'],
+    'detail': ['meta[property="og:title"]', 'li.unitContainer'],
+}
 LISTINGS_PER_PAGE = 40
-BASE_URL = "https://www.apartments.com/apartments-condos/san-diego-county-ca/under-4000/"
-LOG_FILE = "scraper_log.txt"
+FAST_PARSE = True  # build only the subtrees we read, with HTML_PARSER; False = full html.parser tree
+DETAIL_CLASSES = {'unitContainer', 'amenityLabel', 'combinedAmenitiesList', 'uniqueAmenity'}
+PLACARD_PRICE_SELECTOR = '.property-pricing, .price-range, .property-rents'
+SNAPSHOT_NAME = "{prefix}_rentals_{date}.csv"
+SNAPSHOT_PREFIX = "san_diego_county"  # for REGION; see snapshot_prefix()
+STREAM_ROOT = "scrape_parts"
+SEARCH_HOST = "https://www.apartments.com"
+SEARCH_TYPE = "apartments-condos"
+REGION = "san-diego-county-ca"  # the site's location slug; --region searches others
+MAX_PRICE = 4000  # --max-price
+BASE_URL = f"{SEARCH_HOST}/{SEARCH_TYPE}/{REGION}/under-{MAX_PRICE}/"
+MAX_PAGES = 28  # the site serves at most this many pages of one search; search_shards splits past it
+LOG_FILE = "scraper_log.txt"  # appended to across runs
+LOG_LEVEL = logging.INFO
+METRICS_RUN = "scraper"  # per-run metrics go to metrics/scraper_<timestamp>.json
 TEST_MODE = False
 MAX_UNITS = 10
+NUM_WORKERS = 4  # parallel detail-page drivers; 1 = serial
+USE_CACHE = False  # read/write fetched pages through page_cache.PageCache; --cache turns it on
+FETCH_BACKEND = "selenium"  # "selenium": browser only; "http" (--backend http): pooled HTTP client, browser as fallback
+HTTP_POOL_SIZE = 16
+HTTP_TIMEOUT = 15
+# Cheap markers showing the server-rendered HTML already holds what we parse. An index
+# page needs only its results container: past the last page it holds no <article>.
+HTTP_READY = {
+    'index': ['placardContainer'],
+    'detail': ['og:title', 'unitContainer'],
+}
+BLOCKED_MARKERS = ['px-captcha', '<title>Access Denied</title>']  # bot check instead of the page
 
 logging.basicConfig(
     filename=LOG_FILE,
-    filemode='w',
+    filemode='a',
     format='%(asctime)s - %(levelname)s - %(message)s',
-    level=logging.WARNING
+    level=LOG_LEVEL
 )
 
-def init_driver():
-    options = Options()
-    if HEADLESS:
-        options.add_argument("--headless")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("user-agent=Mozilla/5.0")
-    service = Service(EdgeChromiumDriverManager().install(), log_output=os.devnull)
-    return webdriver.Edge(service=service, options=options)
-
-def extract_low_price(price):
-    if pd.isna(price):
-        return None
-    price = re.sub(r'[^\d\-]', '', str(price))
-    return float(price.split('-')[0]) if '-' in price else float(price) if price.isdigit() else None
+PAGE_WAIT = AdaptiveWait()
+
+class HttpFetcher:
+    """
+    Keep-alive HTTP client over one shared connection pool. get() returns the
+    server-rendered HTML, or None when the request fails or the page is
+    incomplete (see page_complete) and has to be rendered by the browser instead.
+    """
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, timeout=HTTP_TIMEOUT):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': 'Mozilla/5.0'})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.counts = {'http': 0, 'fallback': 0}
+        self.lock = threading.Lock()
+
+    def fetch(self, url, kind):
+        """
+        Like get(), but a failed request or non-200 status raises
+        requests.RequestException, so callers can retry it; None means the
+        page came back incomplete and only the browser can render it.
+        """
+        html = None
+        try:
+            with METRICS.timer('http_get_seconds', kind=kind):
+                response = self.session.get(url, timeout=self.timeout)
+            if response.status_code != 200:
+                raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+            if page_complete(response.text, kind):
+                html = response.text
+        except requests.RequestException:
+            METRICS.inc('errors', stage='http')
+            raise
+        finally:
+            with self.lock:
+                self.counts['http' if html is not None else 'fallback'] += 1
+        return html
+
+    def get(self, url, kind):
+        try:
+            return self.fetch(url, kind)
+        except requests.RequestException as e:
+            logging.debug(f"HTTP fetch failed for {url}: {e}")
+            return None
+
+    def summary(self):
+        with self.lock:
+            return dict(self.counts)
+
+    def close(self):
+        self.session.close()
 
 def extract_amenities(soup):
-    labels = soup.select('.amenityLabel') + soup.select('.combinedAmenitiesList li span')
-    fee_section = soup.find(id='fees-policies-pets-tab')
-    unique_features = soup.select('.uniqueAmenity')
-
-    # Combine visible amenity text and pet-related tab content
-    text = ' '.join(el.get_text(separator=' ').lower().strip() for el in labels + unique_features)
-    if fee_section:
-        text += ' ' + fee_section.get_text(separator=' ').lower()
-
+    text = amenity_text(soup)
     logging.debug("Combined amenities and fee policy text: %s", text)
-
-    # Determine pet-friendliness
-    pet_positive_terms = [
-        'dogs allowed', 'cats allowed', 'dog friendly', 'cat friendly',
-        'pet-friendly', 'pets allowed', 'pet friendly'
-    ]
-    pet_negative_terms = [
-        'no pets', 'pets not allowed', 'not pet friendly', 'no animals'
-    ]
-
-    is_pet_friendly = (
-        any(term in text for term in pet_positive_terms)
-        and not any(term in text for term in pet_negative_terms)
-    )
-
+    return AMENITY_CLASSIFIER.classify(text)
+
+
+def keep_index_tag(name, attrs):
+    return name == 'article'
+
+def keep_detail_tag(name, attrs):
+    """True for the top of every subtree parse_property_page and extract_amenities read."""
+    if name == 'meta':
+        return attrs.get('property') == 'og:title'
+    if attrs.get('id') == 'fees-policies-pets-tab':
+        return True
+    classes = attrs.get('class') or ()
+    if isinstance(classes, str):
+        classes = classes.split()
+    return not DETAIL_CLASSES.isdisjoint(classes)
+
+def tag_strainer(keep):
+    """parse_only filter that keeps whole subtrees rooted at tags where keep(name, attrs) is true."""
+    try:
+        from bs4.filter import ElementFilter  # bs4 >= 4.13
+    except ImportError:
+        return SoupStrainer(keep)  # older bs4 calls a callable name with (name, attrs)
+
+    class TagFilter(ElementFilter):
+        def allow_tag_creation(self, nsprefix, name, attrs):
+            return keep(name, attrs or {})
+
+        def allow_string_creation(self, string):
+            return False
+
+    return TagFilter()
+
+INDEX_STRAINER = tag_strainer(keep_index_tag)
+DETAIL_STRAINER = tag_strainer(keep_detail_tag)
+
+def make_soup(html, strainer):
+    if FAST_PARSE:
+        return BeautifulSoup(html, HTML_PARSER, parse_only=strainer)
+    return BeautifulSoup(html, 'html.parser')
+
+def extract_placard(listing):
+    """Pull the index-page fields for one `article` placard, or None if incomplete."""
+    title = listing.find('span', class_='js-placardTitle')
+    address = listing.find('div', class_='property-address')
+    phone = listing.find('button', class_='phone-link')
+    price = listing.select_one(PLACARD_PRICE_SELECTOR)
+    property_url = listing.get('data-url')
+    if not (title and address and property_url):
+        return None
     return {
-        'HasWasherDryer': 'washer/dryer' in text or 'in unit washer' in text or 'front loading washer' in text,
-        'HasAirConditioning': 'air conditioning' in text or 'central ac' in text or 'central aircon' in text,
-        'HasPool': 'pool' in text,
-        'HasSpa': 'spa' in text or 'hot tub' in text,
-        'HasGym': 'fitness center' in text or 'gym' in text,
-        'HasEVCharging': 'ev charging' in text,
-        'IsPetFriendly': is_pet_friendly
+        'Property': title.text.strip(),
+        'Address': address.text.strip(),
+        'Phone': phone.get('phone-data') if phone and phone.has_attr('phone-data') else "N/A",
+        'PriceRange': price.text.strip() if price else None,
+        'ListingURL': property_url
     }
 
-
-def scrape_listings(driver):
+RAW_COLUMNS = [
+    'Property', 'Address', 'Unit', 'Price', 'SqFt', 'Beds', 'Baths', 'RentalType', 'Phone',
+    *AMENITY_CLASSIFIER.columns,
+    'PriceRange',
+    'ListingURL'
+]
+# Fixed dtypes for cleaned chunks, so every part formats numbers the same way
+STREAM_DTYPES = {'Beds': 'Int64', 'Baths': 'float64', 'SqFt': 'float64', 'Price': 'float64', 'PricePerSqFt': 'float64'}
+
+def _raw_number(value):
+    # Turn a cleaned CSV number back into the text form the scraper emits
+    if value in ('', 'N/A'):
+        return "N/A"
+    number = float(value)
+    return str(int(number)) if number.is_integer() else value
+
+class PreviousSnapshot:
+    """
+    Units from an earlier scraper CSV, indexed by ListingURL, for incremental runs.
+    A property is unchanged when its placard title, address and price range
+    text match the snapshot's (PriceRange is stored with every unit); its rows
+    are then carried forward in raw scraper form instead of reopening the
+    detail page. Anything that doesn't match exactly, including snapshots
+    written before PriceRange was recorded, is treated as changed and refetched.
+    """
+
+    def __init__(self, path):
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        self.path = path
+        self.rows = {url: group.to_dict('records') for url, group in df.groupby('ListingURL', sort=False)}
+        self.carried = 0
+        self.changed = 0
+
+    def carry_forward(self, placard):
+        """Return raw unit rows for an unchanged property, or None if it must be fetched."""
+        rows = self.rows.get(placard['ListingURL'])
+        if not rows or not placard.get('PriceRange'):
+            self.changed += 1
+            return None
+        first = rows[0]
+        if (
+            first['Property'] != placard['Property']
+            or first['Address'] != placard['Address']
+            or first.get('PriceRange') != placard['PriceRange']
+        ):
+            self.changed += 1
+            return None
+
+        self.carried += 1
+        return [{
+            'Property': placard['Property'],
+            'Address': placard['Address'],
+            'Unit': row['Unit'] or "N/A",
+            'Price': _raw_number(row['Price']),
+            'SqFt': _raw_number(row['SqFt']),
+            'Beds': _raw_number(row['Beds']),
+            'Baths': _raw_number(row['Baths']),
+            'RentalType': row['RentalType'],
+            'Phone': placard['Phone'],
+            **{col: row[col] == 'True' for col in AMENITY_CLASSIFIER.columns},
+            'PriceRange': placard['PriceRange'],
+            'ListingURL': placard['ListingURL']
+        } for row in rows]
+
+def snapshot_prefix(regions):
+    """File name prefix for a scrape of these location slugs: ['san-diego-county-ca'] -> 'san_diego_county'."""
+    return '_'.join(re.sub(r'-[a-z]{2}$', '', region).replace('-', '_') for region in regions)
+
+def latest_snapshot(prefix=SNAPSHOT_PREFIX):
+    """Newest <prefix>_rentals_*.csv in the working directory, or None."""
+    snapshots = sorted(glob.glob(SNAPSHOT_NAME.format(prefix=prefix, date='*')))
+    return snapshots[-1] if snapshots else None
+
+def parse_index_page(html):
+    """Return the number of `article` placards on an index page and the usable ones."""
+    listings = make_soup(html, INDEX_STRAINER).find_all('article')
+    return len(listings), [p for p in (extract_placard(listing) for listing in listings) if p]
+
+def parse_property_page(html, placard):
+    """Turn a property detail page into one row per unit."""
+    units = []
+    detail_soup = make_soup(html, DETAIL_STRAINER)
+    unit_containers = detail_soup.find_all('li', class_='unitContainer js-unitContainerV3')
+
+    rental_type = "Unknown"
+    og_title_tag = detail_soup.find("meta", property="og:title")
+    if og_title_tag and og_title_tag.get("content"):
+        content = og_title_tag["content"].lower()
+        for term in ["house rental", "townhome", "condo", "apartment"]:
+            if term in content:
+                rental_type = term.replace(" rental", "").capitalize()
+
+    amenities = extract_amenities(detail_soup)
+
+    for unit in unit_containers:
+        unit_number = unit.find('div', class_='unitColumn column')
+        price = unit.find('div', class_='pricingColumn column')
+        sqft = unit.find('div', class_='sqftColumn column')
+        beds = unit.get('data-beds')
+        baths = unit.get('data-baths')
+
+        units.append({
+            'Property': placard['Property'],
+            'Address': placard['Address'],
+            'Unit': unit_number.text.strip() if unit_number else "N/A",
+            'Price': price.text.strip() if price else "N/A",
+            'SqFt': sqft.text.strip() if sqft else "N/A",
+            'Beds': beds if beds else "N/A",
+            'Baths': baths if baths else "N/A",
+            'RentalType': rental_type,
+            'Phone': placard['Phone'],
+            **amenities,
+            'PriceRange': placard['PriceRange'],
+            'ListingURL': placard['ListingURL']
+        })
+
+    return units
+
+def page_complete(html, kind):
+    """
+    True when the HTML holds the HTTP_READY markers of its page kind, i.e. what
+    we parse, and is not a bot check. An index page past the last one is
+    complete: it has the results container, just no placards in it.
+    """
+    return all(marker in html for marker in HTTP_READY[kind]) and not any(marker in html for marker in BLOCKED_MARKERS)
+
+def browser_fetch(driver, url, kind):
+    """Load url in the browser, wait for its PAGE_READY markers and return the HTML."""
+    with METRICS.timer('driver_get_seconds', kind=kind):
+        driver.get(url)
+    PAGE_WAIT.wait(driver, kind, PAGE_READY[kind])
+    METRICS.inc('pages', kind=kind, source='browser')
+    return driver.page_source
+
+def fetch_page(driver, url, kind, http=None, cache=None):
+    """
+    Return the page HTML: from the page cache if present, else the pooled HTTP
+    client, else the browser. Fetched pages are written back to the cache,
+    unless the browser gave up waiting before the page was complete.
+    In replay mode a cache miss returns None instead of fetching.
+    """
+    if cache is not None:
+        html = cache.get(url)
+        if html is not None:
+            METRICS.inc('pages', kind=kind, source='cache')
+            return html
+        if cache.replay:
+            return None
+
+    html = http.get(url, kind) if http is not None else None
+    if html is None:
+        if http is not None:
+            logging.debug(f"Falling back to browser for {url}")
+        html = browser_fetch(driver, url, kind)
+    else:
+        METRICS.inc('pages', kind=kind, source='http')
+
+    if cache is not None and page_complete(html, kind):
+        cache.put(url, html)
+    return html
+
+def scrape_property(driver, placard, http=None, cache=None):
+    """Visit one property detail page and return its unit rows."""
+    property_url = placard['ListingURL']
+    try:
+        html = fetch_page(driver, property_url, 'detail', http, cache)
+        if html is None:
+            METRICS.inc('properties_skipped')
+            logging.warning(f"Not in page cache, skipping {property_url}")
+            return []
+        with METRICS.timer('parse_seconds', kind='detail'):
+            units = parse_property_page(html, placard)
+        METRICS.inc('properties')
+        METRICS.inc('units', len(units))
+        return units
+    except Exception as e:
+        METRICS.inc('errors', stage='scrape')
+        logging.warning(f"Error processing {property_url}: {e}")
+        return []
+
+class DriverPool:
+    """
+    Pool of WebDriver workers that pull property placards from a shared queue.
+    Each worker owns one driver and always quits it on exit. With an HTTP
+    client or page cache the drivers are LazyDriver, so a browser only starts
+    for pages that actually need one.
+    """
+
+    def __init__(self, size, http=None, cache=None):
+        self.http = http
+        self.cache = cache
+        self.tasks = queue.Queue()
+        self.drivers = []
+        self.threads = []
+        try:
+            for _ in range(size):
+                self.drivers.append(LazyDriver() if http or cache else init_driver())
+        except Exception:
+            for driver in self.drivers:
+                driver.quit()
+            raise
+        for driver in self.drivers:
+            thread = threading.Thread(target=self._work, args=(driver,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _work(self, driver):
+        try:
+            while True:
+                task = self.tasks.get()
+                if task is None:
+                    self.tasks.task_done()
+                    break
+                index, placard, results = task
+                try:
+                    results[index] = scrape_property(driver, placard, self.http, self.cache)
+                finally:
+                    self.tasks.task_done()
+        finally:
+            driver.quit()
+
+    def map(self, placards):
+        """Scrape placards in parallel; returns each placard's units, in placard order."""
+        results = [None] * len(placards)
+        for index, placard in enumerate(placards):
+            self.tasks.put((index, placard, results))
+        self.tasks.join()
+        return [units or [] for units in results]
+
+    def close(self):
+        # Drop anything still queued (e.g. after Ctrl-C) so workers reach the sentinel
+        while True:
+            try:
+                self.tasks.get_nowait()
+                self.tasks.task_done()
+            except queue.Empty:
+                break
+        for _ in self.threads:
+            self.tasks.put(None)
+        for thread in self.threads:
+            thread.join()
+
+
+def scrape_listings(driver, num_workers=NUM_WORKERS, http=None, cache=None, previous=None, stream=None,
+                    base_url=None, max_pages=None, max_units=None):
+    """
+    Walk the index pages and scrape every property's detail page.
+    With num_workers > 1 detail pages are fetched by a DriverPool; with an
+    HttpFetcher pages are fetched over HTTP and `driver` is only the fallback;
+    with a PageCache pages already fetched are read from disk.
+    The rows are identical either way. With a PreviousSnapshot, properties
+    whose placard is unchanged are carried forward without a detail fetch.
+    With a ScrapeStream, each page's units are written to disk as the page
+    finishes (resuming after the stream's checkpoint) and None is returned.
+    base_url is the search to walk (default BASE_URL; see search_shards.shard_url).
+    max_pages stops the walk there, for callers that split a capped search.
+    max_units stops it after that many units (default: MAX_UNITS in TEST_MODE, else no limit).
+    """
+    if max_units is None and TEST_MODE:
+        max_units = MAX_UNITS
+    pool = DriverPool(num_workers, http, cache) if num_workers > 1 else None
+    try:
+        return _scrape_listings(driver, pool, http, cache, previous, stream, base_url or BASE_URL,
+                                max_pages, max_units)
+    finally:
+        if pool:
+            pool.close()
+        logging.info(f"Page wait stats: {PAGE_WAIT.summary()}")
+        if http:
+            logging.info(f"HTTP fetch stats: {http.summary()}")
+        if cache:
+            logging.info(f"Page cache stats: {cache.summary()}")
+        if previous:
+            logging.info(f"Incremental: {previous.carried} properties carried forward, {previous.changed} fetched")
+
+def _scrape_listings(driver, pool, http, cache, previous, stream, base_url, max_pages, max_units):
     all_units = []
-    page = 1
+    total = stream.units if stream else 0
+    page = stream.next_page if stream else 1
 
     while True:
-        url = f"{BASE_URL}{page}/"
+        url = f"{base_url}{page}/"
         logging.info(f"Scraping page {page}: {url}")
-        driver.get(url)
-        time.sleep(WAIT_TIME)
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        listings = soup.find_all('article')
-
-        if not listings:
+        html = fetch_page(driver, url, 'index', http, cache)
+        if html is None:
             break
+        with METRICS.timer('parse_seconds', kind='index'):
+            listing_count, placards = parse_index_page(html)
 
-        for listing in listings:
-            title = listing.find('span', class_='js-placardTitle')
-            address = listing.find('div', class_='property-address')
-            phone = listing.find('button', class_='phone-link')
-            property_url = listing.get('data-url')
+        if not listing_count:
+            break
 
-            if title and address and property_url:
-                try:
-                    driver.get(property_url)
-                    time.sleep(WAIT_TIME / 2)
-                    detail_soup = BeautifulSoup(driver.page_source, 'html.parser')
-                    unit_containers = detail_soup.find_all('li', class_='unitContainer js-unitContainerV3')
-
-                    rental_type = "Unknown"
-                    og_title_tag = detail_soup.find("meta", property="og:title")
-                    if og_title_tag and og_title_tag.get("content"):
-                        content = og_title_tag["content"].lower()
-                        for term in ["house rental", "townhome", "condo", "apartment"]:
-                            if term in content:
-                                rental_type = term.replace(" rental", "").capitalize()
-
-                    amenities = extract_amenities(detail_soup)
-
-                    for unit in unit_containers:
-                        unit_number = unit.find('div', class_='unitColumn column')
-                        price = unit.find('div', class_='pricingColumn column')
-                        sqft = unit.find('div', class_='sqftColumn column')
-                        beds = unit.get('data-beds')
-                        baths = unit.get('data-baths')
-
-                        all_units.append({
-                            'Property': title.text.strip(),
-                            'Address': address.text.strip(),
-                            'Unit': unit_number.text.strip() if unit_number else "N/A",
-                            'Price': price.text.strip() if price else "N/A",
-                            'SqFt': sqft.text.strip() if sqft else "N/A",
-                            'Beds': beds if beds else "N/A",
-                            'Baths': baths if baths else "N/A",
-                            'RentalType': rental_type,
-                            'Phone': phone.get('phone-data') if phone and phone.has_attr('phone-data') else "N/A",
-                            **amenities,
-                            'ListingURL': property_url
-                        })
-
-                        if TEST_MODE and len(all_units) >= MAX_UNITS:
-                            logging.info(f"TEST_MODE: Stopping after {MAX_UNITS} listings.")
-                            return pd.DataFrame(all_units)
-
-                except Exception as e:
-                    logging.warning(f"Error processing {property_url}: {e}")
-
-        if len(listings) < LISTINGS_PER_PAGE:
+        carried = {}
+        if previous is not None:
+            for placard in placards:
+                rows = previous.carry_forward(placard)
+                if rows is not None:
+                    carried[placard['ListingURL']] = rows
+        to_fetch = [p for p in placards if p['ListingURL'] not in carried]
+        if carried:
+            # An empty list is a property another search shard already took, not a carry
+            METRICS.inc('properties_carried', sum(1 for rows in carried.values() if rows))
+            METRICS.inc('units_carried', sum(len(rows) for rows in carried.values()))
+
+        page_units = []
+        if pool:
+            fetched = dict(zip((p['ListingURL'] for p in to_fetch), pool.map(to_fetch)))
+            for placard in placards:
+                url = placard['ListingURL']
+                page_units.extend(carried[url] if url in carried else fetched[url])
+        else:
+            for placard in placards:
+                url = placard['ListingURL']
+                page_units.extend(carried[url] if url in carried else scrape_property(driver, placard, http, cache))
+                if max_units and total + len(page_units) >= max_units:
+                    break
+
+        stop = bool(max_units) and total + len(page_units) >= max_units
+        if stop:
+            page_units = page_units[:max_units - total]
+        total += len(page_units)
+        if stream:
+            stream.write_page(page, page_units, placards[-1]['ListingURL'] if placards else None)
+        else:
+            all_units.extend(page_units)
+
+        if stop:
+            logging.info(f"TEST_MODE: Stopping after {max_units} listings.")
+            break
+        if listing_count < LISTINGS_PER_PAGE:
+            break
+        if max_pages and page >= max_pages:
+            logging.info(f"Stopped at page {max_pages}: {base_url}")
             break
         page += 1
 
-    return pd.DataFrame(all_units)
-
-def clean_data(df):
-    df['Price'] = df['Price'].apply(extract_low_price)
-    df['SqFt'] = pd.to_numeric(df['SqFt'].astype(str).str.replace(',', '').str.extract(r'(\d+)', expand=False), errors='coerce')
-    df['Beds'] = pd.to_numeric(df['Beds'], errors='coerce')
-    df['Baths'] = pd.to_numeric(df['Baths'], errors='coerce')
-
-    df['ZipCode'] = df['Address'].str.extract(r'(\d{5})(?!.*\d{5})')
-    city_state = df['Address'].str.extract(r',\s*([^,]+),\s*([A-Z]{2})\s*\d{5}')
-    df['City'] = city_state[0].str.strip()
-    df['State'] = city_state[1].str.strip()
-
-    df['PricePerSqFt'] = df.apply(
-        lambda row: round(row['Price'] / row['SqFt'], 2)
-        if pd.notnull(row['Price']) and pd.notnull(row['SqFt']) and row['SqFt'] > 0 else None,
-        axis=1
-    )
-
-    df['Beds_Baths'] = df.apply(
-        lambda row: f"{int(row['Beds']) if pd.notnull(row['Beds']) else 'N/A'} Bed / {int(row['Baths']) if pd.notnull(row['Baths']) else 'N/A'} Bath",
-        axis=1
-    )
-
-    final_order = [
-        'Property', 'Address', 'City', 'State', 'ZipCode', 'Phone',
-        'Unit', 'Beds', 'Baths', 'Beds_Baths', 'SqFt', 'Price', 'PricePerSqFt',
-        'RentalType',
-        'HasWasherDryer', 'HasAirConditioning', 'HasPool', 'HasSpa',
-        'HasGym', 'HasEVCharging',
-        'IsPetFriendly',
-        'ListingURL'
-    ]
-    return df[final_order]
-
-def main():
+    return None if stream else pd.DataFrame(all_units)
+
+class ScrapeStream:
+    """
+    Streams raw units to disk as one CSV part per index page, next to a
+    checkpoint.json naming the last finished page and property URL. A run
+    started on an existing directory resumes after the checkpoint.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.checkpoint_path = os.path.join(directory, 'checkpoint.json')
+        self.checkpoint = {'page': 0, 'last_property': None, 'units': 0, 'complete': False}
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                self.checkpoint = json.load(f)
+            logging.info(f"Resuming stream in {directory} after page {self.checkpoint['page']}")
+
+    @property
+    def next_page(self):
+        return self.checkpoint['page'] + 1
+
+    @property
+    def units(self):
+        return self.checkpoint['units']
+
+    @property
+    def complete(self):
+        return self.checkpoint['complete']
+
+    def _save_checkpoint(self):
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def write_page(self, page, units, last_property):
+        # Part first, then checkpoint: a crash in between only repeats this page
+        path = os.path.join(self.directory, f'part-{page:05d}.csv')
+        pd.DataFrame(units, columns=RAW_COLUMNS).to_csv(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+        self.checkpoint.update(page=page, last_property=last_property, units=self.units + len(units))
+        self._save_checkpoint()
+
+    def finish(self):
+        self.checkpoint['complete'] = True
+        self._save_checkpoint()
+
+    def read_chunks(self):
+        """Yield each part as a raw-units DataFrame, exactly as scrape_listings would have built it."""
+        for path in sorted(glob.glob(os.path.join(self.directory, 'part-*.csv'))):
+            chunk = pd.read_csv(path, dtype=str, keep_default_na=False)
+            for col in AMENITY_CLASSIFIER.columns:
+                chunk[col] = chunk[col] == 'True'
+            if not chunk.empty:
+                yield chunk
+
+def write_clean_csv(chunks, filename):
+    """Clean raw-unit chunks one at a time and append them to filename; returns rows written."""
+    rows = 0
+    for chunk in chunks:
+        with METRICS.stage('clean'):
+            chunk = clean_data(chunk)
+            try:
+                chunk = chunk.astype(STREAM_DTYPES)
+            except TypeError:
+                logging.warning("Fractional Beds in chunk; writing Beds as float")
+                chunk = chunk.astype({**STREAM_DTYPES, 'Beds': 'float64'})
+        with METRICS.stage('save'):
+            chunk.to_csv(filename, mode='w' if rows == 0 else 'a', header=rows == 0, index=False)
+        rows += len(chunk)
+    return rows
+
+def main(replay=False, use_cache=USE_CACHE, cache_dir=CACHE_DIR, previous_path=None, stream_dir=None,
+         metrics_port=None, use_async=False, shards=None, shard_workers=None, prefix=SNAPSHOT_PREFIX,
+         backend=FETCH_BACKEND):
+    """
+    Scrape to <prefix>_rentals_<date>.csv. `shards` (search_shards.plan_shards)
+    default to the single BASE_URL search; they run in parallel, and any that
+    reach the page cap are split. A stream walks exactly one search.
+    """
+    from search_shards import SHARD_WORKERS, plan_shards, scrape_shards, shard_url
     start_time = time.time()
-    driver = init_driver()
-    df = scrape_listings(driver)
-    driver.quit()
-
-    if df.empty:
-        print("No data collected. File not saved.")
-        logging.warning("No data collected. File not saved.")
+    METRICS.reset()
+    if metrics_port:
+        METRICS.serve(metrics_port)
+        print(f"Serving metrics on http://127.0.0.1:{metrics_port}/metrics")
+    shards = shards or plan_shards()
+    filename = SNAPSHOT_NAME.format(prefix=prefix, date=datetime.today().strftime("%Y-%m-%d"))
+    stream = ScrapeStream(stream_dir) if stream_dir else None
+    if stream and len(shards) > 1:
+        raise ValueError("a stream walks one search; got several shards")
+    previous = PreviousSnapshot(previous_path) if previous_path else None
+    cache = PageCache(cache_dir, replay=replay) if use_cache or replay else None
+    if cache and not replay:
+        print(f"Page cache on: pages fetched in the last {cache.ttl_days} days are reused from {cache_dir}")
+    http = HttpFetcher() if backend == "http" and not replay else None
+    driver = LazyDriver()  # only the stream path walks with it; shards make their own
+    failures = None
+    try:
+        if stream and stream.complete:
+            df = None
+        elif stream and use_async:
+            from scrape_orchestrator import scrape_listings_async
+            with METRICS.stage('scrape'):
+                df, failures = scrape_listings_async(http, cache, previous, stream, base_url=shard_url(shards[0]))
+            stream.finish()
+        elif stream:
+            with METRICS.stage('scrape'):
+                df = scrape_listings(driver, NUM_WORKERS, http, cache, previous, stream, shard_url(shards[0]))
+            stream.finish()
+        else:
+            with METRICS.stage('scrape'):
+                df, failures = scrape_shards(shards, http, cache, previous, use_async,
+                                             shard_workers or SHARD_WORKERS)
+        if failures is not None and use_async:
+            from scrape_orchestrator import FAILED_REPORT, report_failures
+            report_failures(failures, FAILED_REPORT.format(date=datetime.today().strftime("%Y-%m-%d")))
+    finally:
+        driver.quit()
+        if http:
+            http.close()
+        if cache:
+            cache.close()
+        METRICS.write_json(METRICS_RUN)  # keep the scrape's metrics even if it was interrupted
+
+    if stream:
+        saved = write_clean_csv(stream.read_chunks(), filename) > 0
+    elif not df.empty:
+        with METRICS.stage('clean'):
+            cleaned = clean_data(df)
+        with METRICS.stage('save'):
+            cleaned.to_csv(filename, index=False)
+        saved = True
     else:
-        df = clean_data(df)
-        filename = f'san_diego_county_rentals_{datetime.today().strftime("%Y-%m-%d")}.csv'
-        df.to_csv(filename, index=False)
+        saved = False
+
+    if saved:
         print(f"Scraping complete. Data saved to {filename}")
         logging.info(f"Scraping complete. Data saved to {filename}")
+    else:
+        print("No data collected. File not saved.")
+        logging.warning("No data collected. File not saved.")
+
+    metrics_path = METRICS.write_json(METRICS_RUN)
+    print(f"Run metrics written to {metrics_path}")
 
     duration = time.time() - start_time
     minutes, seconds = divmod(duration, 60)
     print(f"Script runtime: {int(minutes)} minutes and {seconds:.2f} seconds")
 
+def cli():
+    """The command line; run it as `python scraper.py --help`."""
+    parser = argparse.ArgumentParser(description="Scrape rental listings (San Diego County by default) to CSV.")
+    parser.add_argument('--replay', action='store_true',
+                        help="rebuild the CSV from cached pages only, without a browser or network")
+    parser.add_argument('--cache', action='store_true',
+                        help="read and write the page cache; pages fetched in the last "
+                             f"{CACHE_TTL_DAYS} days are reused instead of refetched (--replay needs them)")
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help="page cache directory")
+    parser.add_argument('--backend', choices=['selenium', 'http'], default=FETCH_BACKEND,
+                        help="fetch pages in the browser, or over plain HTTP with the browser as fallback "
+                             f"for pages missing what we parse (default: {FETCH_BACKEND})")
+    parser.add_argument('--incremental', nargs='?', const='', metavar='SNAPSHOT',
+                        help="skip detail pages of properties unchanged since SNAPSHOT "
+                             "(default: newest <region>_rentals_*.csv)")
+    parser.add_argument('--stream', nargs='?', const=STREAM_ROOT, metavar='DIR',
+                        help="write units to disk page by page under DIR/<date>, resuming "
+                             "from its checkpoint if a previous run stopped early")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="fetch with the asyncio orchestrator (rate limits, retries, parallel "
+                             "parsing; see scrape_orchestrator.py)")
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help="serve live metrics in Prometheus text format on PORT while scraping")
+    search = parser.add_argument_group('search', "what to search, and how to shard it (see search_shards.py)")
+    search.add_argument('--region', nargs='+', default=[REGION], metavar='SLUG',
+                        help=f"the site's location slugs, one search each (default: {REGION}); "
+                             "several cities shard a county by city")
+    search.add_argument('--max-price', type=int, default=MAX_PRICE,
+                        help=f"price ceiling, 0 for none (default: {MAX_PRICE})")
+    search.add_argument('--min-price', type=int, help="price floor")
+    search.add_argument('--price-band', type=int, metavar='DOLLARS',
+                        help="shard each region into price bands this wide")
+    search.add_argument('--by-beds', action='store_true', help="shard each search by bedroom count")
+    search.add_argument('--shard-workers', type=int, metavar='N', help="shards walked at once (default: 4)")
+    args = parser.parse_args()
+
+    from search_shards import plan_shards
+    shards = plan_shards(args.region, args.max_price or None, args.min_price, args.price_band, args.by_beds)
+    prefix = snapshot_prefix(args.region)
+    stream_dir = None
+    if args.stream is not None:
+        if len(shards) > 1:
+            parser.error("--stream walks one search; drop --price-band/--by-beds or give one --region")
+        stream_dir = os.path.join(args.stream, datetime.today().strftime("%Y-%m-%d"))
+    previous_path = None
+    if args.incremental is not None:
+        previous_path = args.incremental or latest_snapshot(prefix)
+        if not previous_path:
+            parser.error("--incremental: no previous snapshot found")
+    main(replay=args.replay, use_cache=args.cache or USE_CACHE, cache_dir=args.cache_dir,
+         previous_path=previous_path, stream_dir=stream_dir, metrics_port=args.metrics_port,
+         use_async=args.use_async, shards=shards, shard_workers=args.shard_workers, prefix=prefix,
+         backend=args.backend)
+
 if __name__ == "__main__":
-    main()
+    # Run from the module search_shards and scrape_orchestrator import, not from this
+    # __main__ copy of it, so they share one PAGE_WAIT and one set of settings
+    import scraper
+    scraper.cli()
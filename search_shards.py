@@ -0,0 +1,201 @@
+"""
+Sharded search for scraper.py: split the listing search into narrower
+searches by price band, bedroom count and/or region, walk them in parallel
+and merge their units.
+
+    python scraper.py --price-band 500                            # eight $500 bands under $4000
+    python scraper.py --price-band 250 --by-beds --max-price 6000
+    python scraper.py --region chula-vista-ca oceanside-ca carlsbad-ca --max-price 3500
+    python scraper.py --region orange-county-ca --price-band 500 --async
+
+Regions are the site's location slugs (a county or a city). The site serves
+at most scraper.MAX_PAGES pages of one search; a shard that fills them is
+split again (its price band in halves, then by bedrooms) so the listings
+past the cap are still reached. Shards overlap at band edges and wherever a
+property's units span bands or bedroom counts: each property is scraped by
+the first shard that reaches it, and the merged units are deduplicated by
+ListingURL + Unit.
+"""
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+import scraper
+from pipeline_metrics import METRICS
+from rental_core.browser import LazyDriver
+
+SHARD_WORKERS = 4  # shards walked at once
+MIN_PRICE_BAND = 100  # a capped shard narrower than twice this is split by bedrooms instead
+BED_COUNTS = (0, 1, 2, 3, 4)  # the site's bedroom filters; 0 = studios
+
+Shard = namedtuple('Shard', ['region', 'beds', 'min_price', 'max_price'])
+
+
+def price_slug(min_price, max_price):
+    if min_price and max_price:
+        return f"{min_price}-to-{max_price}"
+    if max_price:
+        return f"under-{max_price}"
+    if min_price:
+        return f"over-{min_price}"
+    return ''
+
+def beds_slug(beds):
+    if beds is None:
+        return ''
+    return 'studios' if beds == 0 else f"{beds}-bedrooms"
+
+def shard_url(shard):
+    """Search URL of a shard; Shard(scraper.REGION, None, None, scraper.MAX_PRICE) is scraper.BASE_URL."""
+    filters = '-'.join(s for s in (beds_slug(shard.beds), price_slug(shard.min_price, shard.max_price)) if s)
+    return f"{scraper.SEARCH_HOST}/{scraper.SEARCH_TYPE}/{shard.region}/" + (f"{filters}/" if filters else '')
+
+def shard_name(shard):
+    return shard_url(shard)[len(scraper.SEARCH_HOST):]
+
+def plan_shards(regions=(scraper.REGION,), max_price=scraper.MAX_PRICE, min_price=None, price_band=None,
+                by_beds=False):
+    """
+    Every region x price band x bedroom count. Without price_band each region
+    is one price range; bands need a max_price and start at min_price (or 0).
+    """
+    prices = [(min_price, max_price)]
+    if price_band and max_price:
+        low = min_price or 0
+        prices = [(lo or None, min(lo + price_band, max_price)) for lo in range(low, max_price, price_band)]
+    beds = BED_COUNTS if by_beds else (None,)
+    return [Shard(region, b, lo, hi) for region in regions for lo, hi in prices for b in beds]
+
+def split_shard(shard):
+    """Narrower shards covering a capped one: two price halves, else one per bedroom count; [] if neither."""
+    low = shard.min_price or 0
+    if shard.max_price and shard.max_price - low >= 2 * MIN_PRICE_BAND:
+        middle = low + (shard.max_price - low) // 2 // MIN_PRICE_BAND * MIN_PRICE_BAND
+        return [shard._replace(max_price=middle), shard._replace(min_price=middle)]
+    if shard.beds is None:
+        return [shard._replace(beds=beds) for beds in BED_COUNTS]
+    return []
+
+class ShardClaims:
+    """
+    The `previous` hook scrape_listings calls for every placard, for one
+    shard: a property another shard already took comes back as no rows (so
+    its detail page is not fetched twice); otherwise it is claimed and the
+    real PreviousSnapshot, if any, decides. Counts placards to spot a shard
+    that reached the page cap.
+    """
+
+    def __init__(self, claimed, lock, previous=None):
+        self.claimed = claimed  # ListingURLs taken by any shard of this run
+        self.lock = lock
+        self.previous = previous
+        self.placards = 0
+        self.duplicates = 0
+        self.carried = 0
+        self.changed = 0
+
+    def carry_forward(self, placard):
+        self.placards += 1
+        with self.lock:
+            if placard['ListingURL'] in self.claimed:
+                self.duplicates += 1
+                return []
+            self.claimed.add(placard['ListingURL'])
+            rows = self.previous.carry_forward(placard) if self.previous is not None else None
+        if rows is None:
+            self.changed += 1
+        else:
+            self.carried += 1
+        return rows
+
+    def capped(self):
+        # A full page can hold a placard or two extract_placard drops, so allow one page of slack
+        return self.placards >= (scraper.MAX_PAGES - 1) * scraper.LISTINGS_PER_PAGE
+
+def merge_units(frames):
+    """Concatenate per-shard units, dropping rows whose ListingURL + Unit an earlier shard already returned."""
+    frames = [df for df in frames if df is not None and not df.empty]
+    if not frames:
+        return pd.DataFrame()
+    merged = pd.concat(frames, ignore_index=True)
+    shard = pd.Series([i for i, df in enumerate(frames) for _ in range(len(df))])
+    first_shard = shard.groupby([merged['ListingURL'], merged['Unit']], dropna=False).transform('min')
+    return merged[(shard == first_shard).values].reset_index(drop=True)
+
+def scrape_sharded(shards, scrape_shard, workers=SHARD_WORKERS, previous=None):
+    """
+    Run scrape_shard(shard, claims) -> units DataFrame for every shard on
+    `workers` threads, splitting shards that reach the page cap, and merge
+    the results in shard order.
+    """
+    claimed, lock = set(), threading.Lock()
+    results = {}
+    order = list(shards)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def submit(shard):
+            claims = ShardClaims(claimed, lock, previous)
+            return pool.submit(scrape_shard, shard, claims), claims
+
+        running = {}
+        for shard in order:
+            future, claims = submit(shard)
+            running[future] = (shard, claims)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                shard, claims = running.pop(future)
+                results[shard] = future.result()
+                METRICS.inc('shards')
+                METRICS.inc('shard_duplicates', claims.duplicates)
+                print(f"{shard_name(shard)}: {claims.placards} listings, {claims.duplicates} already taken, "
+                      f"{len(results[shard])} units")
+                if not claims.capped():
+                    continue
+                narrower = split_shard(shard)
+                if not narrower:
+                    logging.warning(f"{shard_name(shard)} reached the {scraper.MAX_PAGES}-page cap "
+                                    "and cannot be split further; some listings may be missing")
+                    continue
+                METRICS.inc('shards_split')
+                print(f"{shard_name(shard)} reached the {scraper.MAX_PAGES}-page cap; "
+                      f"splitting into {len(narrower)} shards")
+                order[order.index(shard) + 1:order.index(shard) + 1] = narrower
+                for child in narrower:
+                    child_future, child_claims = submit(child)
+                    running[child_future] = (child, child_claims)
+    return merge_units(results[shard] for shard in order)
+
+def scrape_shards(shards, http=None, cache=None, previous=None, use_async=False, workers=SHARD_WORKERS,
+                  num_workers=scraper.NUM_WORKERS):
+    """
+    Scrape every shard with the threaded scraper (a LazyDriver per shard and
+    num_workers detail drivers each, so up to workers x num_workers browsers
+    when pages need one) or, with use_async, on one shared scrape_orchestrator
+    event loop whose rate limits cover all shards. Returns (units DataFrame,
+    [FailedURL]).
+    """
+    if use_async:
+        from scrape_orchestrator import SearchRunner
+        runner = SearchRunner(http, cache)
+
+        def scrape_shard(shard, claims):
+            return runner.scrape(claims, shard_url(shard), scraper.MAX_PAGES)
+
+        try:
+            df = scrape_sharded(shards, scrape_shard, workers, previous)
+        finally:
+            runner.close()
+        return df, runner.failures
+
+    def scrape_shard(shard, claims):
+        driver = LazyDriver()
+        try:
+            return scraper.scrape_listings(driver, num_workers, http, cache, claims, None, shard_url(shard),
+                                          scraper.MAX_PAGES)
+        finally:
+            driver.quit()
+
+    return scrape_sharded(shards, scrape_shard, workers, previous), []
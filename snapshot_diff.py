@@ -0,0 +1,179 @@
+"""
+Month-over-month unit changes between consecutive snapshots: new, removed and
+re-priced units, plus rollups by zip code and bed count.
+
+    python snapshot_diff.py SD_county_*.csv --changes changes.csv --rollup rollup.csv
+    python snapshot_diff.py --store snapshot_store --rollup rollup.csv
+    python snapshot_diff.py san_diego_county_rentals_*.csv      # raw files: ListingURL + Unit
+    python snapshot_diff.py resolved/SD_county_*.csv             # property_resolver.py output: canonical_id
+"""
+import argparse
+import calendar
+import glob
+import os
+import re
+
+import pandas as pd
+
+from rental_schema import format_property_id, text_column
+
+RAW_NAME = re.compile(r'san_diego_county_rentals_(\d{4})-(\d{2})-(\d{2})\.csv$')
+PROCESSED_NAME = re.compile(r'SD_county_([A-Za-z]+)_(\d{4})\.csv$')
+MONTH_NUMBERS = {name: number for number, name in enumerate(calendar.month_name) if name}
+DIFF_COLUMNS = ['property_id', 'listingurl', 'unit', 'zipcode', 'beds', 'price']
+FILE_COLUMNS = DIFF_COLUMNS + ['canonical_id']  # only in files written by property_resolver.py
+JOIN_KEYS = ['canonical_id', 'property_id', 'url_unit']  # preferred first
+CHANGE_COLUMNS = [
+    'period_before', 'period', 'key', 'status', 'zipcode', 'beds',
+    'price_before', 'price', 'delta', 'pct_delta'
+]
+
+
+def snapshot_period(path):
+    """Sortable (year, month, day) and label for a raw or processed snapshot file name."""
+    name = os.path.basename(path)
+    match = RAW_NAME.search(name)
+    if match:
+        year, month, day = map(int, match.groups())
+        return (year, month, day), f"{year}-{month:02d}-{day:02d}"
+    match = PROCESSED_NAME.search(name)
+    if match and match.group(1) in MONTH_NUMBERS:
+        year, month = int(match.group(2)), MONTH_NUMBERS[match.group(1)]
+        return (year, month, 0), f"{year}-{month:02d}"
+    raise ValueError(f"{name}: no snapshot date in the file name")
+
+
+def prepare_snapshot(df):
+    """The columns a diff needs, with every join key present: canonical_id, property_id and ListingURL|unit."""
+    df = df.rename(columns=str.lower)
+    unit = df['unit'].astype('string').str.strip().str.lower().fillna('')
+    frame = pd.DataFrame({
+        'url_unit': df['listingurl'].astype('string').str.strip() + '|' + unit,
+        'zipcode': text_column(df['zipcode']),
+        'beds': pd.to_numeric(df['beds'], errors='coerce').round().astype('Int8'),
+        'price': pd.to_numeric(df['price'], errors='coerce'),
+    })
+    for key in ('property_id', 'canonical_id'):
+        if key in df.columns:
+            frame[key] = text_column(df[key])
+    if 'property_id' in df.columns and pd.api.types.is_unsigned_integer_dtype(df['property_id']):
+        # The snapshot store keeps property_id as a number; match the zero-padded text of the CSVs
+        frame['property_id'] = format_property_id(df['property_id']).astype('string')
+    return frame
+
+
+def iter_files(paths):
+    """(label, frame) for each snapshot file in date order, reading one file at a time."""
+    for _, label, path in sorted((*snapshot_period(path), path) for path in paths):
+        df = pd.read_csv(path, usecols=lambda c: c.lower() in FILE_COLUMNS, dtype=str, keep_default_na=False)
+        yield label, prepare_snapshot(df)
+
+
+def iter_store(store):
+    """(label, frame) for each month of a snapshot_store.SnapshotStore, reading only the diff columns."""
+    for year, month in store.partitions():
+        df = store.read(DIFF_COLUMNS, since=(year, month), until=(year, month))
+        yield f"{year}-{month:02d}", prepare_snapshot(df)
+
+
+def diff_snapshots(label_before, before, label, after):
+    """
+    New, removed and re-priced units between two prepared snapshots, joined
+    on the first of JOIN_KEYS both have: canonical_id, property_id, then
+    ListingURL + Unit. A re-priced unit has a price in both snapshots and
+    the prices differ.
+    """
+    key = next(key for key in JOIN_KEYS if key in before.columns and key in after.columns)
+    before = before.drop_duplicates(key).set_index(key)
+    after = after.drop_duplicates(key).set_index(key)
+    joined = before.join(after, how='outer', lsuffix='_before')
+    in_before = joined.index.isin(before.index)
+    in_after = joined.index.isin(after.index)
+
+    status = pd.Series('unchanged', index=joined.index)
+    status[~in_before] = 'new'
+    status[~in_after] = 'removed'
+    repriced = in_before & in_after & joined['price_before'].notna() & joined['price'].notna() \
+        & (joined['price_before'] != joined['price'])
+    status[repriced] = 'repriced'
+
+    delta = (joined['price'] - joined['price_before']).where(repriced)
+    changes = pd.DataFrame({
+        'period_before': label_before,
+        'period': label,
+        'key': joined.index,
+        'status': status.values,
+        'zipcode': joined['zipcode'].fillna(joined['zipcode_before']).values,
+        'beds': joined['beds'].fillna(joined['beds_before']).values,
+        'price_before': joined['price_before'].values,
+        'price': joined['price'].values,
+        'delta': delta.values,
+        'pct_delta': (delta / joined['price_before'] * 100).round(2).values,
+    })
+    return changes[changes['status'] != 'unchanged'].reset_index(drop=True)
+
+
+def rollup_changes(changes):
+    """Per period, zip code and bed count: units new/removed/re-priced and the price moves."""
+    changes = changes.assign(
+        new=changes['status'].eq('new'),
+        removed=changes['status'].eq('removed'),
+        repriced=changes['status'].eq('repriced'),
+        increased=changes['delta'] > 0,
+        decreased=changes['delta'] < 0,
+    )
+    return changes.groupby(['period_before', 'period', 'zipcode', 'beds'], dropna=False).agg(
+        new=('new', 'sum'),
+        removed=('removed', 'sum'),
+        repriced=('repriced', 'sum'),
+        increased=('increased', 'sum'),
+        decreased=('decreased', 'sum'),
+        mean_delta=('delta', 'mean'),
+        median_pct_delta=('pct_delta', 'median'),
+    ).reset_index()
+
+
+def diff_history(snapshots):
+    """
+    (label before, label, changes) for each consecutive pair of (label, frame)
+    snapshots, in order. Only the previous and current snapshot are held in memory.
+    """
+    previous = None
+    for label, frame in snapshots:
+        if previous is not None:
+            yield previous[0], label, diff_snapshots(*previous, label, frame)
+        previous = (label, frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff consecutive rental snapshots.")
+    parser.add_argument('paths', nargs='*', help='raw or processed snapshot CSVs (globs allowed)')
+    parser.add_argument('--store', help='read months from this snapshot store instead')
+    parser.add_argument('--changes', help='write unit-level changes to this CSV')
+    parser.add_argument('--rollup', help='write zip/beds rollups to this CSV')
+    args = parser.parse_args()
+
+    if args.store:
+        from snapshot_store import SnapshotStore
+        snapshots = iter_store(SnapshotStore(args.store))
+    else:
+        snapshots = iter_files([path for pattern in args.paths for path in glob.glob(pattern)])
+
+    first = True
+    for label_before, label, changes in diff_history(snapshots):
+        counts = changes['status'].value_counts()
+        print(
+            f"{label_before} -> {label}: "
+            f"{counts.get('new', 0)} new, {counts.get('removed', 0)} removed, "
+            f"{counts.get('repriced', 0)} re-priced"
+        )
+        mode = 'w' if first else 'a'
+        if args.changes:
+            changes[CHANGE_COLUMNS].to_csv(args.changes, mode=mode, header=first, index=False)
+        if args.rollup:
+            rollup_changes(changes).to_csv(args.rollup, mode=mode, header=first, index=False)
+        first = False
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""
+Monthly snapshots as a Parquet dataset partitioned by year/month:
+
+    snapshot_store/year=2025/month=6/data.parquet
+
+    python snapshot_store.py import SD_county_*.csv      # backfill processed CSVs
+    python snapshot_store.py list
+"""
+import argparse
+import glob
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from rental_schema import FINAL_DTYPES, text_column
+
+STORE_DIR = "snapshot_store"
+PARTITION_KEYS = ['year', 'month']
+
+# Low-cardinality text kept dictionary-encoded on disk and read back as categoricals
+DICTIONARY_COLUMNS = ['property', 'city', 'state', 'zipcode', 'rentaltype', 'beds_baths']
+_DICT = pa.dictionary(pa.int32(), pa.string())
+
+
+def _arrow_type(name, dtype):
+    """Arrow type of a rental_schema.FINAL_DTYPES column; categoricals are stored as text."""
+    if dtype == 'category':
+        return _DICT if name in DICTIONARY_COLUMNS else pa.string()
+    dtype = pd.api.types.pandas_dtype(dtype)
+    return pa.from_numpy_dtype(getattr(dtype, 'numpy_dtype', dtype))
+
+
+# Columns of a processed month (rental_schema.FINAL_DTYPES) minus the partition keys
+STORE_SCHEMA = pa.schema([
+    (name, _arrow_type(name, dtype)) for name, dtype in FINAL_DTYPES.items() if name not in PARTITION_KEYS
+])
+PARTITIONING = ds.partitioning(
+    pa.schema([(name, _arrow_type(name, FINAL_DTYPES[name])) for name in PARTITION_KEYS]), flavor='hive'
+)
+
+_OPERATORS = {
+    '==': lambda f, v: f == v,
+    '=': lambda f, v: f == v,
+    '!=': lambda f, v: f != v,
+    '<': lambda f, v: f < v,
+    '<=': lambda f, v: f <= v,
+    '>': lambda f, v: f > v,
+    '>=': lambda f, v: f >= v,
+    'in': lambda f, v: f.isin(list(v)),
+    'not in': lambda f, v: ~f.isin(list(v)),
+}
+
+
+def to_table(df):
+    """Coerce a processed month (database column names) to STORE_SCHEMA."""
+    df = df.rename(columns=str.lower)
+    columns = {}
+    for field in STORE_SCHEMA:
+        col = df[field.name] if field.name in df.columns else pd.Series(pd.NA, index=df.index)
+        if pa.types.is_boolean(field.type):
+            col = col.map({True: True, False: False, 'True': True, 'False': False}).astype('boolean')
+        elif pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            col = pd.to_numeric(col, errors='coerce')
+            if pa.types.is_integer(field.type):
+                col = col.round().astype('Int64')
+        else:
+            col = text_column(col)
+        columns[field.name] = pa.array(col, from_pandas=True).cast(field.type)
+    return pa.Table.from_pydict(columns, schema=STORE_SCHEMA)
+
+
+class SnapshotStore:
+    """
+    Parquet store of processed monthly snapshots, one partition per month.
+
+    Writing a month replaces its partition. Reads project columns and push
+    filters down to pyarrow: year/month predicates skip whole partitions
+    from the directory names, other predicates are checked against row-group
+    statistics before any data is decoded.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+
+    def _partition_dir(self, year, month):
+        return os.path.join(self.root, f"year={int(year)}", f"month={int(month)}")
+
+    def write_month(self, df, year, month):
+        """Store one processed month, replacing any earlier copy of it."""
+        table = to_table(df)
+        directory = self._partition_dir(year, month)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "data.parquet")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        pq.write_table(table, tmp_path, compression='zstd', use_dictionary=DICTIONARY_COLUMNS)
+        os.replace(tmp_path, path)
+        return path
+
+    def import_csv(self, path):
+        """Store a processed SD_county_<Month>_<Year>.csv; month/year come from its columns."""
+        df = pd.read_csv(path, dtype=str, keep_default_na=False).rename(columns=str.lower)
+        months = df[['year', 'month']].drop_duplicates()
+        if len(months) != 1:
+            raise ValueError(f"{os.path.basename(path)}: expected one month, found {len(months)}")
+        year, month = (int(v) for v in months.iloc[0])
+        return self.write_month(df, year, month)
+
+    def partitions(self):
+        """Stored (year, month) pairs, oldest first."""
+        found = []
+        for path in glob.glob(os.path.join(self.root, "year=*", "month=*", "data.parquet")):
+            month_dir = os.path.dirname(path)
+            year = int(os.path.basename(os.path.dirname(month_dir)).split('=')[1])
+            month = int(os.path.basename(month_dir).split('=')[1])
+            found.append((year, month))
+        return sorted(found)
+
+    def dataset(self):
+        # The explicit schema also casts months written under an older STORE_SCHEMA
+        return ds.dataset(
+            self.root, format='parquet', schema=pa.unify_schemas([STORE_SCHEMA, PARTITIONING.schema]),
+            partitioning=PARTITIONING, exclude_invalid_files=True, ignore_prefixes=['.', '_']
+        )
+
+    def read(self, columns=None, filters=None, last_months=None, since=None, until=None):
+        """
+        Read snapshots into a DataFrame.
+
+        columns: columns to load (year/month included), default all.
+        filters: (column, op, value) tuples, ANDed; op is one of
+            == != < <= > >= in, not in.
+        last_months: only the newest N stored months.
+        since / until: inclusive (year, month) bounds.
+
+            store.read(['price', 'beds'], [('zipcode', '==', '92101')], last_months=6)
+        """
+        keys = self.partitions()
+        if last_months is not None:
+            keys = keys[-last_months:] if last_months > 0 else []
+        if since is not None:
+            keys = [k for k in keys if k >= tuple(since)]
+        if until is not None:
+            keys = [k for k in keys if k <= tuple(until)]
+        if not keys:
+            return self._empty(columns)
+
+        expression = None
+        if last_months is not None or since is not None or until is not None:
+            for year, month in keys:
+                term = (ds.field('year') == year) & (ds.field('month') == month)
+                expression = term if expression is None else expression | term
+        for column, op, value in filters or []:
+            if op not in _OPERATORS:
+                raise ValueError(f"Unsupported filter operator: {op!r}")
+            term = _OPERATORS[op](ds.field(column), value)
+            expression = term if expression is None else expression & term
+
+        table = self.dataset().to_table(columns=columns, filter=expression)
+        return table.to_pandas()
+
+    def _empty(self, columns):
+        schema = pa.unify_schemas([STORE_SCHEMA, PARTITIONING.schema])
+        if columns is not None:
+            schema = pa.schema([schema.field(c) for c in columns])
+        return schema.empty_table().to_pandas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the Parquet snapshot store.")
+    parser.add_argument('--store', default=STORE_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('import', help='store processed SD_county_*.csv files')
+    add.add_argument('paths', nargs='+')
+    commands.add_parser('list', help='list stored months')
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.store)
+    if args.command == 'import':
+        for pattern in args.paths:
+            for path in sorted(glob.glob(pattern)):
+                print(f"{os.path.basename(path)} -> {store.import_csv(path)}")
+    else:
+        for year, month in store.partitions():
+            rows = pq.ParquetFile(os.path.join(store._partition_dir(year, month), "data.parquet")).metadata.num_rows
+            print(f"{year}-{month:02d}: {rows} rows")
+
+
+if __name__ == '__main__':
+    main()